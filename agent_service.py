@@ -0,0 +1,260 @@
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+import collections
+import os
+import threading
+import time
+import uuid
+import uvicorn
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from main import AgentResources, load_config, run_conversation
+from startup_snapshot import load_config_snapshot
+from tracing import tracer
+
+CONFIG_PATH = os.environ.get("AGENT_SERVICE_CONFIG", "config.yaml")
+DEFAULT_MAX_CONCURRENT_TASKS = 8   # conversations running at the same time
+DEFAULT_MAX_QUEUED_TASKS = 100     # accepted tasks waiting for a slot; beyond this POST /tasks returns 429
+DEFAULT_LLM_CONCURRENCY = 4        # generations in flight on the shared LLM client
+DEFAULT_MAX_FINISHED_TASKS = 1000  # finished tasks kept for GET /tasks/{id}
+MAX_TASK_EVENTS = 200              # most recent log lines kept per task
+TASK_STATES = ("queued", "running", "completed", "failed", "cancelled")
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class AgentTask:
+    """One conversation: its prompt, limits, state and recent log lines"""
+
+    def __init__(self, user_prompt, max_iterations):
+        self.task_id = uuid.uuid4().hex
+        self.user_prompt = user_prompt
+        self.max_iterations = max_iterations
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.events = collections.deque(maxlen=MAX_TASK_EVENTS)
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def log(self, message):
+        self.events.append({"time": round(time.time(), 3), "message": str(message)})
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self, events=0):
+        task = {
+            "task_id": self.task_id,
+            "status": self.status,
+            "user_prompt": self.user_prompt,
+            "max_iterations": self.max_iterations,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+        if events:
+            task["events"] = list(self.events)[-events:]
+        return task
+
+
+class TaskManager:
+    """Queue and run agent conversations on one set of shared resources.
+
+    Up to `max_concurrent_tasks` conversations run at once on a thread pool
+    and at most `max_queued_tasks` more wait for a slot. Every conversation
+    has its own ConversationState; the discovered servers, pooled HTTP
+    connections and LLM client are shared, and `llm_concurrency` bounds how
+    many of the running conversations generate at the same time.
+    """
+
+    def __init__(self, resources, max_concurrent_tasks=DEFAULT_MAX_CONCURRENT_TASKS,
+                 max_queued_tasks=DEFAULT_MAX_QUEUED_TASKS, llm_concurrency=DEFAULT_LLM_CONCURRENCY,
+                 max_iterations=10, max_finished_tasks=DEFAULT_MAX_FINISHED_TASKS):
+        self.resources = resources
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.max_queued_tasks = max_queued_tasks
+        self.llm_concurrency = llm_concurrency
+        self.max_iterations = max_iterations
+        self.max_finished_tasks = max_finished_tasks
+        self.llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_tasks, thread_name_prefix="agent-task")
+        self._tasks = collections.OrderedDict()   # task_id -> AgentTask, in submission order
+        self._lock = threading.Lock()
+
+    def submit(self, user_prompt, max_iterations=None):
+        """Queue a conversation; raises QueueFull when `max_queued_tasks` are already waiting"""
+        # A task may lower the iteration limit but not raise it above the service's
+        max_iterations = min(max_iterations or self.max_iterations, self.max_iterations)
+        task = AgentTask(user_prompt, max_iterations)
+        with self._lock:
+            queued = sum(1 for existing in self._tasks.values() if existing.status == "queued")
+            if queued >= self.max_queued_tasks:
+                raise QueueFull(f"{queued} tasks already queued")
+            self._tasks[task.task_id] = task
+            self._prune()
+            task.future = self._executor.submit(self._run, task)
+        return task
+
+    def _run(self, task):
+        if task.cancel_event.is_set():
+            self._finish(task, "cancelled")
+            return
+        task.status = "running"
+        task.started_at = time.time()
+        try:
+            summary = run_conversation(self.resources, task.user_prompt, max_iterations=task.max_iterations,
+                                       cancel_event=task.cancel_event, llm_slots=self.llm_slots, log=task.log)
+        except Exception as e:
+            task.error = f"{type(e).__name__}: {e}"
+            task.log(f"Error: {task.error}")
+            self._finish(task, "failed")
+            return
+        task.result = summary
+        self._finish(task, "cancelled" if summary["cancelled"] else "completed")
+
+    def _finish(self, task, status):
+        task.status = status
+        task.finished_at = time.time()
+
+    def _prune(self):
+        """Forget the oldest finished tasks beyond `max_finished_tasks` (caller holds the lock)"""
+        finished = [task_id for task_id, task in self._tasks.items() if task.finished]
+        for task_id in finished[:max(0, len(finished) - self.max_finished_tasks)]:
+            del self._tasks[task_id]
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def list(self, status=None):
+        with self._lock:
+            tasks = list(self._tasks.values())
+        return [task for task in tasks if status is None or task.status == status]
+
+    def cancel(self, task_id):
+        """Cancel a queued task, or stop a running one at its next token or step; None if unknown"""
+        task = self.get(task_id)
+        if task is None:
+            return None
+        task.cancel_event.set()
+        if task.future is not None and task.future.cancel():
+            # Never started: the worker will not run it, so finish it here
+            self._finish(task, "cancelled")
+        return task
+
+    def stats(self):
+        with self._lock:
+            counts = collections.Counter(task.status for task in self._tasks.values())
+        stats = {
+            "tasks": {state: counts.get(state, 0) for state in TASK_STATES},
+            "max_concurrent_tasks": self.max_concurrent_tasks,
+            "max_queued_tasks": self.max_queued_tasks,
+            "llm_concurrency": self.llm_concurrency,
+            "max_iterations": self.max_iterations,
+            "tools": self.resources.router.tool_names(),
+            # The process-wide tracer keeps only the most recent spans; per-task timings are in each result
+            "trace": {"spans": len(tracer.spans), "dropped": tracer.dropped},
+        }
+        if self.resources.llm_cache:
+            stats["llm_cache"] = self.resources.llm_cache.stats()
+        return stats
+
+    def shutdown(self):
+        """Cancel everything still queued or running and release the shared resources"""
+        for task in self.list():
+            if not task.finished:
+                self.cancel(task.task_id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.resources.close()
+
+
+def create_manager(config, snapshot=None):
+    service_config = config.get("agent_service", {}) or {}
+    resources = AgentResources.from_config(config, snapshot)
+    return TaskManager(
+        resources,
+        max_concurrent_tasks=service_config.get("max_concurrent_tasks", DEFAULT_MAX_CONCURRENT_TASKS),
+        max_queued_tasks=service_config.get("max_queued_tasks", DEFAULT_MAX_QUEUED_TASKS),
+        llm_concurrency=service_config.get("llm_concurrency", DEFAULT_LLM_CONCURRENCY),
+        max_iterations=config.get("max_iterations", 10),
+        max_finished_tasks=service_config.get("max_finished_tasks", DEFAULT_MAX_FINISHED_TASKS),
+    )
+
+
+manager: Optional[TaskManager] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Discovery and the LLM client are set up once and shared by every task
+    global manager
+    manager = await run_in_threadpool(create_manager, *load_config_snapshot(CONFIG_PATH))
+    try:
+        yield
+    finally:
+        await run_in_threadpool(manager.shutdown)
+        manager = None
+
+app = FastAPI(lifespan=lifespan)
+
+class TaskRequest(BaseModel):
+    user_prompt: str = Field(..., min_length=1, description="What the agent should do")
+    max_iterations: Optional[int] = Field(None, ge=1, description="LLM turns for this task (capped by the service limit)")
+
+def _get_task(task_id: str) -> AgentTask:
+    task = manager.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task: {task_id}")
+    return task
+
+@app.post("/tasks", status_code=202)
+def submit_task(request: TaskRequest):
+    """Queue an agent conversation; poll GET /tasks/{task_id} for its progress and result"""
+    try:
+        task = manager.submit(request.user_prompt, request.max_iterations)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Task queue is full: {e}")
+    return task.to_dict()
+
+@app.get("/tasks")
+def list_tasks(status: Optional[str] = Query(None, description=f"Only tasks in this state: {', '.join(TASK_STATES)}")):
+    if status is not None and status not in TASK_STATES:
+        raise HTTPException(status_code=400, detail=f"Unknown status '{status}': use one of {', '.join(TASK_STATES)}")
+    return {"tasks": [task.to_dict() for task in manager.list(status)]}
+
+@app.get("/tasks/{task_id}")
+def get_task(task_id: str,
+             events: int = Query(50, ge=0, le=MAX_TASK_EVENTS, description="Most recent log lines to include")):
+    return _get_task(task_id).to_dict(events=events)
+
+@app.delete("/tasks/{task_id}", status_code=202)
+def cancel_task(task_id: str):
+    """Cancel a queued task, or stop a running one at its next token or step"""
+    task = _get_task(task_id)
+    if task.finished:
+        raise HTTPException(status_code=409, detail=f"Task {task_id} already {task.status}")
+    manager.cancel(task_id)
+    return task.to_dict()
+
+@app.get("/stats")
+def get_stats():
+    return manager.stats()
+
+def run_service(host: str = None, port: int = None):
+    service_config = load_config(CONFIG_PATH).get("agent_service", {}) or {}
+    uvicorn.run("agent_service:app", host=host or service_config.get("host", "127.0.0.1"),
+                port=port or service_config.get("port", 8000), reload=False)
+
+if __name__ == "__main__":
+    run_service()
@@ -0,0 +1,192 @@
+"""Micro-benchmark: the compiled tool-call parser vs. the original regex cascade.
+
+Runs both over a corpus of recorded LLM responses (one JSON object with a
+"response" key per line) and reports where the two disagree and:
+
+- one-shot latency per complete response. The cascade is somewhat faster
+  here: it stops at the first call and lowercases paths, while the parser
+  returns every call, keeps path case and understands call syntax.
+- the streaming path the agent actually uses. The cascade can only run
+  once generation has finished. ToolCallParser is fed token by token, has
+  the calls ready when a block's closing fence arrives, and lets
+  generation stop there (`llm_stop_at_tool_call`).
+
+    python benchmarks/bench_parser.py [--corpus benchmarks/parser_corpus.jsonl] [--repeat 2000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import parse_llm_request  # noqa: E402
+from tool_parser import ToolCallParser, parse_tool_calls  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus.jsonl")
+TOKEN_CHARS = 4   # rough characters per LLM token when replaying a response as a stream
+
+
+def legacy_parse_llm_request(llm_response):
+    """The original regex cascade from main.py, kept verbatim for comparison"""
+    llm_response_lower = llm_response.lower()
+
+    # Check for list action
+    if any(keyword in llm_response_lower for keyword in ["list", "show files", "show directory", "list files", "list directory"]):
+        # Prioritize tool_code blocks first - these are the most reliable
+        tool_code_patterns = [
+            r'```tool_code\s*\n\s*list_files\s+([^\n]+)',
+            r'```\s*\n\s*list_files\s+([^\n]+)',
+        ]
+
+        for pattern in tool_code_patterns:
+            match = re.search(pattern, llm_response_lower)
+            if match:
+                path = match.group(1).strip()
+                # Clean up the path
+                path = re.sub(r'[^\w/~\-\.]', '', path)  # Keep only valid path characters
+                if path and len(path) > 1:
+                    return "list", {"path": path}
+
+        # Only if no tool_code block found, look for natural language patterns
+        # But be very strict about what constitutes a path
+        natural_patterns = [
+            r'list\s+files?\s+in\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
+            r'list\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
+            r'show\s+directory\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
+        ]
+
+        for pattern in natural_patterns:
+            match = re.search(pattern, llm_response_lower)
+            if match:
+                path = match.group(1).strip()
+                # Clean up the path
+                path = re.sub(r'[^\w/~\-\.]', '', path)  # Keep only valid path characters
+                if path and len(path) > 1:
+                    return "list", {"path": path}
+
+        # Default to current directory if no specific path found
+        return "list", {"path": "."}
+
+    # Check for read action
+    elif any(keyword in llm_response_lower for keyword in ["read", "open file", "show content", "display file"]):
+        # Prioritize tool_code blocks first
+        tool_code_patterns = [
+            r'```tool_code\s*\n\s*read_file\s+([^\n]+)',
+            r'```\s*\n\s*read_file\s+([^\n]+)',
+        ]
+
+        for pattern in tool_code_patterns:
+            match = re.search(pattern, llm_response_lower)
+            if match:
+                filename = match.group(1).strip()
+                # Clean up the filename
+                filename = re.sub(r'[^\w/~\-\.]', '', filename)  # Keep only valid path characters
+                if filename and len(filename) > 1:
+                    return "read", {"path": filename}
+
+        # Only if no tool_code block found, look for natural language patterns
+        natural_patterns = [
+            r'read\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
+            r'read\s+file\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
+        ]
+
+        for pattern in natural_patterns:
+            match = re.search(pattern, llm_response_lower)
+            if match:
+                filename = match.group(1).strip()
+                # Clean up the filename
+                filename = re.sub(r'[^\w/~\-\.]', '', filename)  # Keep only valid path characters
+                if filename and len(filename) > 1:
+                    return "read", {"path": filename}
+
+    return None, None
+
+
+def load_corpus(path):
+    with open(path, "r") as f:
+        return [json.loads(line)["response"] for line in f if line.strip()]
+
+
+def time_per_response(func, corpus, repeat):
+    def run():
+        for text in corpus:
+            func(text)
+    seconds = min(timeit.repeat(run, number=repeat, repeat=3))
+    return seconds / (repeat * len(corpus)) * 1e6
+
+
+def tokenize(text):
+    return [text[i:i + TOKEN_CHARS] for i in range(0, len(text), TOKEN_CHARS)]
+
+
+def stream_until_calls(tokens):
+    """Feed tokens like LLMClient.prompt with stop_at_tool_call; return (parser, tokens consumed)"""
+    parser = ToolCallParser()
+    for count, token in enumerate(tokens, start=1):
+        if parser.feed(token):
+            return parser, count
+    return parser, len(tokens)
+
+
+def streaming_stats(corpus, repeat):
+    """Per-response microseconds spent feeding tokens during generation and parsing after it ends,
+    and the characters early stop leaves ungenerated"""
+    token_lists = [tokenize(text) for text in corpus]
+    feed_us = time_per_response(lambda tokens: stream_until_calls(tokens), token_lists, repeat)
+    # After the last token: the cascade parses the whole response, the streaming parser only flushes
+    after_legacy_us = time_per_response(legacy_parse_llm_request, corpus, repeat)
+    best = None
+    for _ in range(3):
+        parsers = [stream_until_calls(tokens)[0] for tokens in token_lists for _ in range(repeat)]
+        started = timeit.default_timer()
+        for parser in parsers:
+            parser.close()
+        elapsed = timeit.default_timer() - started
+        best = elapsed if best is None else min(best, elapsed)
+    after_parser_us = best / len(parsers) * 1e6
+    generated = sum(min(len(text), stream_until_calls(tokens)[1] * TOKEN_CHARS)
+                    for text, tokens in zip(corpus, token_lists))
+    total = sum(map(len, corpus))
+    return feed_us, after_legacy_us, after_parser_us, total - generated, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"Corpus: {len(corpus)} responses, {sum(map(len, corpus))} chars")
+
+    results = [
+        ("legacy regex cascade", time_per_response(legacy_parse_llm_request, corpus, args.repeat)),
+        ("parse_llm_request (first call)", time_per_response(parse_llm_request, corpus, args.repeat)),
+        ("parse_tool_calls (all calls)", time_per_response(parse_tool_calls, corpus, args.repeat)),
+    ]
+    baseline = results[0][1]
+    print("One-shot parse of a complete response:")
+    for name, micros in results:
+        print(f"  {name:32s} {micros:8.2f} us/response  ({baseline / micros:4.1f}x)")
+
+    feed_us, after_legacy_us, after_parser_us, saved, total = streaming_stats(corpus, max(1, args.repeat // 4))
+    print(f"\nStreaming ({TOKEN_CHARS}-char tokens, stop at the first block with calls):")
+    print(f"  {'ToolCallParser.feed, during gen.':32s} {feed_us:8.2f} us/response")
+    print(f"  {'legacy cascade, after gen.':32s} {after_legacy_us:8.2f} us/response")
+    print(f"  {'ToolCallParser.close, after gen.':32s} {after_parser_us:8.2f} us/response")
+    print(f"  early stop: {saved} of {total} response chars ({saved / total:.0%}) never generated")
+
+    print("\nDifferences (legacy -> new):")
+    for index, text in enumerate(corpus, start=1):
+        old, new = legacy_parse_llm_request(text), parse_llm_request(text)
+        if old != new:
+            extra = len(parse_tool_calls(text)) - 1
+            note = f"  (+{extra} more calls)" if extra > 0 else ""
+            print(f"  #{index}: {old} -> {new}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""End-to-end benchmark: in-process filesystem server, generated trees and a fake LLM.
+
+Starts `mcp_server_filesystem.app` under uvicorn on a free local port, points
+it at a generated tree (see fixtures.py) and a scripted stand-in for Ollama
+(see fake_llm.py), then reports throughput and p50/p99 latency for
+discovery, /list, /read, parse_llm_request and complete `run_agent` runs.
+
+    python benchmarks/bench_system.py                         # 1k files, wide
+    python benchmarks/bench_system.py --files 100000 --shape deep --concurrency 16
+    python benchmarks/bench_system.py --only list,read --json results.json
+
+Nothing outside the temporary directory (or --root) is touched: the
+server's persistent caches go to a temporary MCP_FS_CACHE_DIR and no
+discovery registry or LLM cache is written.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("MCP_FS_CACHE_DIR", tempfile.mkdtemp(prefix="mcp-bench-cache-"))
+
+import uvicorn  # noqa: E402
+
+import mcp_server_filesystem  # noqa: E402
+from bench_parser import DEFAULT_CORPUS, load_corpus  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from fixtures import generate_tree  # noqa: E402
+from http_transport import configure_transport  # noqa: E402
+from main import parse_llm_request, run_agent  # noqa: E402
+from mcp_discovery import discover_mcp_services  # noqa: E402
+
+BENCHMARKS = ("discovery", "list", "read", "parse", "agent")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running_server(port):
+    """Serve mcp_server_filesystem.app on 127.0.0.1:`port` from a background thread"""
+    server = uvicorn.Server(uvicorn.Config(mcp_server_filesystem.app, host="127.0.0.1", port=port,
+                                           log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="mcp-server", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"MCP server failed to start on port {port}")
+        time.sleep(0.01)
+    try:
+        yield f"127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(name, func, args_list, concurrency=1):
+    """Call `func(*args)` for every entry of `args_list` and summarise the latencies"""
+    def timed(args):
+        started = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, args_list))
+    else:
+        latencies = [timed(args) for args in args_list]
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "name": name,
+        "n": len(latencies),
+        "concurrency": concurrency,
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+def checked_get(http, url, params):
+    response = http.get(url, params=params)
+    response.raise_for_status()
+    return response.content
+
+
+def bench_discovery(address, runs):
+    host, port = address.split(":")
+    args = [()] * runs
+    return [measure("discovery", lambda: discover_mcp_services([host], ports=[int(port)]), args)]
+
+
+def bench_list(http, address, tree, requests, concurrency, rng):
+    url = f"http://{address}/list"
+    paths = [os.path.join(tree["root"], rng.choice(tree["directories"])) for _ in range(requests)]
+    results = []
+    for level in sorted({1, concurrency}):
+        results.append(measure("/list", lambda path: checked_get(http, url, {"path": path}),
+                               [(path,) for path in paths], level))
+        results.append(measure("/list details", lambda path: checked_get(http, url, {"path": path, "details": "true"}),
+                               [(path,) for path in paths], level))
+    return results
+
+
+def bench_read(http, address, tree, requests, concurrency, rng):
+    url = f"http://{address}/read"
+    paths = [os.path.join(tree["root"], rng.choice(tree["sample_files"])) for _ in range(requests)]
+    results = []
+    for level in sorted({1, concurrency}):
+        results.append(measure("/read small", lambda path: checked_get(http, url, {"path": path}),
+                               [(path,) for path in paths], level))
+    if tree["large_files"]:
+        large = os.path.join(tree["root"], tree["large_files"][0])
+        pages = [(rng.randrange(0, 3 * 1024 * 1024),) for _ in range(max(1, requests // 5))]
+        results.append(measure("/read 256K page",
+                               lambda offset: checked_get(http, url, {"path": large, "offset": offset, "length": 262144}),
+                               pages, 1))
+        results.append(measure("/read stream 4MB", lambda: checked_get(http, url, {"path": large, "stream": "true"}),
+                               [()] * max(1, requests // 50), 1))
+    return results
+
+
+def bench_parse(repeat):
+    corpus = load_corpus(DEFAULT_CORPUS)
+    args = [(text,) for _ in range(repeat) for text in corpus]
+    return [measure("parse_llm_request", parse_llm_request, args)]
+
+
+def agent_config(address, llm_port):
+    host, port = address.split(":")
+    return {
+        "llm_provider": "ollama",
+        "llm_model": "fake",
+        "ollama_port": llm_port,
+        "llm_stop_at_tool_call": True,
+        "system_prompt": "You are a filesystem agent with access to MCP tools.",
+        "user_prompt": "Explore the fixture tree.",
+        "discovery": {"hosts": [host], "ports": [int(port)], "registry_path": None},
+        "http": {},
+        "conversation": {},
+        "max_parallel_tools": 8,
+    }
+
+
+def bench_agent(address, tree, runs, first_token_delay, token_delay):
+    sample = tree["sample_files"]
+    placeholders = {
+        "root": tree["root"],
+        "first_dir": os.path.join(tree["root"], tree["directories"][0]),
+        "first_file": os.path.join(tree["root"], sample[0]),
+        "second_file": os.path.join(tree["root"], sample[len(sample) // 2]),
+    }
+    with FakeLLMServer(first_token_delay=first_token_delay, token_delay=token_delay, **placeholders) as llm:
+        config = agent_config(address, llm.port)
+
+        def run():
+            # The agent narrates every step on stdout; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = run_agent(config)
+            if not summary or summary["tool_calls"] == 0:
+                raise RuntimeError(f"Agent run made no tool calls: {summary}")
+
+        run()  # warm-up: imports, first connections
+        return [measure("run_agent (4 turns)", run, [()] * runs)]
+
+
+def print_report(results):
+    print(f"\n{'benchmark':<22} {'n':>6} {'conc':>4} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for row in results:
+        print(f"{row['name']:<22} {row['n']:>6} {row['concurrency']:>4} {row['throughput_per_s']:>10} "
+              f"{row['p50_ms']:>10} {row['p99_ms']:>10} {row['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", help="Fixture tree location (default: a directory under the system temp dir)")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--shape", choices=("wide", "deep"), default="wide")
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per /list and /read benchmark")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--discovery-runs", type=int, default=20)
+    parser.add_argument("--parse-repeat", type=int, default=200)
+    parser.add_argument("--agent-runs", type=int, default=10)
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Fake LLM delay before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake LLM delay between tokens (s)")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    selected = set(args.only.split(",")) if args.only else set(BENCHMARKS)
+    unknown = selected - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    root = args.root or os.path.join(tempfile.gettempdir(), f"mcp-bench-{args.shape}-{args.files}")
+    started = time.perf_counter()
+    tree = generate_tree(root, files=args.files, shape=args.shape, files_per_dir=args.files_per_dir)
+    print(f"Fixture: {tree['root']} ({tree['files']} files, {len(tree['directories'])} directories, "
+          f"{tree['shape']}) ready in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    http = configure_transport({"pool_maxsize": max(16, args.concurrency)})
+    results = []
+    with running_server(free_port()) as address:
+        if "discovery" in selected:
+            results += bench_discovery(address, args.discovery_runs)
+        if "list" in selected:
+            results += bench_list(http, address, tree, args.requests, args.concurrency, rng)
+        if "read" in selected:
+            results += bench_read(http, address, tree, args.requests, args.concurrency, rng)
+        if "parse" in selected:
+            results += bench_parse(args.parse_repeat)
+        if "agent" in selected:
+            results += bench_agent(address, tree, args.agent_runs, args.first_token_delay, args.token_delay)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"tree": {k: v for k, v in tree.items() if k not in ("directories", "sample_files")},
+                       "args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
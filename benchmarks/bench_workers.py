@@ -0,0 +1,170 @@
+"""Load test: single-worker vs multi-worker mcp_server_filesystem under mixed load.
+
+For each worker count, starts `python mcp_server_filesystem.py --workers N`
+as a separate process on a generated tree (see fixtures.py), then measures
+light requests (/list of a directory, /read of a small file) at the given
+concurrency twice: on an idle server, and while `--heavy-clients` threads
+keep issuing whole-tree /walk and /duplicates scans. The gap between the
+two shows how much heavy requests hold up everyone else.
+
+    python benchmarks/bench_workers.py                          # 1 vs 4 workers, 20k files
+    python benchmarks/bench_workers.py --workers 1,2,8 --threads 16 --json workers.json
+
+Each run gets a fresh MCP_FS_CACHE_DIR so hash caches do not carry over
+between configurations. Multiple workers only pay off with more than one
+core; the report prints the core count next to the results.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_system import checked_get, free_port, measure, print_report  # noqa: E402
+from fixtures import generate_tree  # noqa: E402
+from http_transport import configure_transport  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT = 60
+
+
+def start_server(port, workers, threads, cache_dir):
+    command = [sys.executable, "mcp_server_filesystem.py", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers)]
+    if threads:
+        command += ["--threads", str(threads)]
+    env = {**os.environ, "MCP_FS_CACHE_DIR": cache_dir}
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process
+
+
+def wait_until_ready(http, address, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if http.get(f"http://{address}/pwd", timeout=1).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server on {address} did not start within {STARTUP_TIMEOUT}s")
+
+
+def stop_server(process):
+    # SIGTERM lets uvicorn drain in-flight requests and run the lifespan shutdown
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def heavy_load(http, address, root, stop, completed):
+    """Alternate whole-tree walks and duplicate scans until `stop` is set"""
+    calls = [
+        ("walk", {"path": root, "limit": 100}),
+        ("duplicates", {"path": root, "mode": "content", "max_groups": 10}),
+        ("duplicates", {"path": root, "mode": "name_size", "max_groups": 10}),
+    ]
+    index = 0
+    while not stop.is_set():
+        action, params = calls[index % len(calls)]
+        index += 1
+        try:
+            checked_get(http, f"http://{address}/{action}", params)
+            completed.append(action)
+        except Exception:
+            if not stop.is_set():
+                raise
+
+
+def light_requests(tree, count, rng):
+    root = tree["root"]
+    requests = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            requests.append(("list", {"path": os.path.join(root, rng.choice(tree["directories"]))}))
+        else:
+            requests.append(("read", {"path": os.path.join(root, rng.choice(tree["sample_files"]))}))
+    return requests
+
+
+def bench_workers(http, tree, workers, threads, requests, concurrency, heavy_clients):
+    cache_dir = tempfile.mkdtemp(prefix=f"mcp-bench-workers{workers}-")
+    port = free_port()
+    address = f"127.0.0.1:{port}"
+    process = start_server(port, workers, threads, cache_dir)
+    try:
+        wait_until_ready(http, address, process)
+
+        def call(action, params):
+            checked_get(http, f"http://{address}/{action}", params)
+
+        rng = random.Random(workers)
+        measure("warm-up", call, light_requests(tree, 50, rng), concurrency)
+        idle = measure(f"{workers}w idle", call, light_requests(tree, requests, rng), concurrency)
+
+        stop = threading.Event()
+        completed = []
+        heavy = [threading.Thread(target=heavy_load, args=(http, address, tree["root"], stop, completed), daemon=True)
+                 for _ in range(heavy_clients)]
+        started = time.perf_counter()
+        for thread in heavy:
+            thread.start()
+        time.sleep(0.5)  # let the scans get going
+        loaded = measure(f"{workers}w +{heavy_clients} heavy", call, light_requests(tree, requests, rng), concurrency)
+        stop.set()
+        for thread in heavy:
+            thread.join()
+        loaded["heavy_completed"] = len(completed)
+        loaded["heavy_per_s"] = round(len(completed) / (time.perf_counter() - started), 2)
+        return [idle, loaded]
+    finally:
+        stop_server(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", help="Fixture tree location (default: a directory under the system temp dir)")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--shape", choices=("wide", "deep"), default="wide")
+    parser.add_argument("--workers", default="1,4", help="Comma-separated worker counts to compare")
+    parser.add_argument("--threads", type=int, help="Threadpool size per worker (default: anyio's 40)")
+    parser.add_argument("--requests", type=int, default=500, help="Light requests per measurement")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--heavy-clients", type=int, default=2)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    root = args.root or os.path.join(tempfile.gettempdir(), f"mcp-bench-{args.shape}-{args.files}")
+    tree = generate_tree(root, files=args.files, shape=args.shape)
+    print(f"Fixture: {tree['root']} ({tree['files']} files, {tree['shape']}); {os.cpu_count()} CPU core(s)")
+
+    http = configure_transport({"pool_maxsize": max(16, args.concurrency + args.heavy_clients)})
+    results = []
+    for workers in [int(count) for count in args.workers.split(",")]:
+        results += bench_workers(http, tree, workers, args.threads, args.requests, args.concurrency, args.heavy_clients)
+
+    print_report(results)
+    for row in results:
+        if "heavy_per_s" in row:
+            print(f"{row['name']:<22} heavy scans completed: {row['heavy_completed']} ({row['heavy_per_s']}/s)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
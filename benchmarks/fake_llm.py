@@ -0,0 +1,105 @@
+"""Stand-in for Ollama's /api/generate that replays a scripted conversation.
+
+The step is derived from the prompt itself (the highest "Round N:" in the
+conversation history, or the `context` handed back by a previous reply), so
+the server is stateless and any number of agent runs can share it.
+Responses are streamed as NDJSON in small chunks, optionally paced to mimic
+a model's time to first token and generation speed.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUND_PATTERN = re.compile(r"Round (\d+): LLM Request")
+CHUNK_CHARS = 4   # about one token
+
+DEFAULT_SCRIPT = [
+    "```tool_code\nlist_files {root}\n```",
+    "```tool_code\nlist_files {first_dir}\n```",
+    "```tool_code\nread_file {first_file}\nread_file {second_file}\n```",
+    "Final answer: the fixture tree was listed and sampled.",
+]
+
+
+class FakeLLMServer:
+    """Threaded fake Ollama server; use as a context manager or call start()/stop()"""
+
+    def __init__(self, script=None, host="127.0.0.1", port=0, first_token_delay=0.0, token_delay=0.0,
+                 **placeholders):
+        self.script = [step.format(**placeholders) for step in (script or DEFAULT_SCRIPT)]
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                step = server.step_for(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    server.replay(self, step)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped reading (e.g. stop_at_tool_call)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    def step_for(self, body):
+        context = body.get("context")
+        if context:
+            return context[0]
+        rounds = [int(number) for number in ROUND_PATTERN.findall(body.get("prompt", ""))]
+        return max(rounds, default=0)
+
+    def replay(self, handler, step):
+        text = self.script[min(step, len(self.script) - 1)]
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+        chunks = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+        for chunk in chunks:
+            self._write(handler, {"response": chunk, "done": False})
+            if self.token_delay:
+                time.sleep(self.token_delay)
+        self._write(handler, {"done": True, "context": [step + 1], "eval_count": len(chunks)})
+        handler.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _write(handler, message):
+        line = json.dumps(message).encode("utf-8") + b"\n"
+        handler.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        handler.wfile.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
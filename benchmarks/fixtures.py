@@ -0,0 +1,115 @@
+"""Deterministic directory trees for benchmarks.
+
+    python benchmarks/fixtures.py /tmp/mcp-bench-tree --files 100000 --shape deep
+
+Two shapes are generated:
+
+- wide: `files / files_per_dir` sibling directories directly under the root
+- deep: the same directories chained `depth` levels deep, so walks and
+  path resolution pay for long paths
+
+Every tree also gets a few large files at the root for paging/streaming
+reads, and one file in ten duplicates another's content so /duplicates has
+work to do. A `.fixture.json` marker records the parameters; an existing
+tree with the same marker is reused instead of regenerated.
+"""
+import argparse
+import json
+import os
+import shutil
+
+MARKER = ".fixture.json"
+DEFAULT_FILES = 1000
+DEFAULT_FILES_PER_DIR = 100
+DEFAULT_DEPTH = 16
+DEFAULT_FILE_SIZE = 256
+DEFAULT_LARGE_FILES = 2
+LARGE_FILE_SIZE = 4 * 1024 * 1024
+
+
+def _content(index, size):
+    # One file in ten repeats the content of the file before it
+    seed = index - 1 if index % 10 == 9 else index
+    line = f"fixture file {seed} lorem ipsum dolor sit amet TODO {seed % 97}\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _directories(count, shape, depth):
+    """Relative directory paths for `count` directories of the given shape"""
+    if shape == "wide":
+        return [f"d{index:05d}" for index in range(count)]
+    paths = []
+    for chain in range((count + depth - 1) // depth):
+        parts = []
+        for level in range(depth):
+            if len(paths) == count:
+                break
+            parts.append(f"c{chain:04d}_l{level:02d}")
+            paths.append("/".join(parts))
+    return paths
+
+
+def _file_path(index, directories, shape, files_per_dir):
+    directory = directories[index // files_per_dir if shape == "wide" else index % len(directories)]
+    return f"{directory}/f{index:07d}.txt"
+
+
+def generate_tree(root, files=DEFAULT_FILES, shape="wide", files_per_dir=DEFAULT_FILES_PER_DIR,
+                  depth=DEFAULT_DEPTH, file_size=DEFAULT_FILE_SIZE, large_files=DEFAULT_LARGE_FILES):
+    """Create (or reuse) a tree under `root` and return its description.
+
+    The description lists the directories and a sample of file paths
+    (relative to `root`) that benchmarks can pick requests from.
+    """
+    if shape not in ("wide", "deep"):
+        raise ValueError(f"Unknown shape '{shape}': use 'wide' or 'deep'")
+    params = {"files": files, "shape": shape, "files_per_dir": files_per_dir, "depth": depth,
+              "file_size": file_size, "large_files": large_files}
+    directories = _directories(max(1, -(-files // files_per_dir)), shape, depth)
+    description = {
+        "root": os.path.abspath(root),
+        **params,
+        "directories": directories,
+        "sample_files": [_file_path(index, directories, shape, files_per_dir)
+                         for index in range(0, files, max(1, files // 1000))],
+        "large_files": [f"large{index}.log" for index in range(large_files)],
+    }
+
+    marker_path = os.path.join(root, MARKER)
+    try:
+        with open(marker_path) as f:
+            if json.load(f) == params:
+                return description
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+    for directory in directories:
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+    for index in range(files):
+        with open(os.path.join(root, _file_path(index, directories, shape, files_per_dir)), "w") as f:
+            f.write(_content(index, file_size))
+    for name in description["large_files"]:
+        with open(os.path.join(root, name), "w") as f:
+            f.write(_content(0, LARGE_FILE_SIZE))
+    with open(marker_path, "w") as f:
+        json.dump(params, f)
+    return description
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a benchmark directory tree")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES)
+    parser.add_argument("--shape", choices=("wide", "deep"), default="wide")
+    parser.add_argument("--files-per-dir", type=int, default=DEFAULT_FILES_PER_DIR)
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--file-size", type=int, default=DEFAULT_FILE_SIZE)
+    args = parser.parse_args()
+    tree = generate_tree(args.root, args.files, args.shape, args.files_per_dir, args.depth, args.file_size)
+    print(f"{tree['root']}: {tree['files']} files in {len(tree['directories'])} directories ({tree['shape']})")
+
+
+if __name__ == "__main__":
+    main()
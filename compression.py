@@ -0,0 +1,141 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+DEFAULT_MINIMUM_SIZE = 1024   # smaller bodies are sent as is
+DEFAULT_GZIP_LEVEL = 6        # level 9 costs far more CPU for a few percent on JSON
+DEFAULT_ZSTD_LEVEL = 3
+# Event streams must not be buffered, and raw file bytes are mostly already compressed
+# (or random): compressing them again only burns CPU
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "application/octet-stream")
+# No body, or a byte range whose offsets refer to the uncompressed representation
+UNCOMPRESSED_STATUSES = (204, 206, 304)
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits 16+MAX_WBITS writes the gzip header and trailer rather than raw zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd when the client accepts it, otherwise gzip.
+
+    Plain ASGI middleware: the response start is held back until the first
+    body chunk shows whether the response is worth compressing. Bodies below
+    `minimum_size`, excluded content types, responses that already carry a
+    `Content-Encoding` and 204/206/304 responses pass through untouched.
+    Streamed responses are flushed chunk by chunk so NDJSON batches and file
+    streams stay incremental. zstd needs the optional `zstandard` package;
+    without it only gzip is offered.
+    """
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE, compresslevel: int = DEFAULT_GZIP_LEVEL,
+                 zstd_level: int = DEFAULT_ZSTD_LEVEL, exclude_content_types=EXCLUDED_CONTENT_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.zstd_level = zstd_level
+        self.exclude_content_types = tuple(exclude_content_types)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if zstandard is not None and _accepts(accept_encoding, "zstd"):
+            coding = "zstd"
+        elif _accepts(accept_encoding, "gzip"):
+            coding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, coding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compressor(self, coding: str):
+        if coding == "zstd":
+            return ZstdCompressor(self.zstd_level)
+        return GzipCompressor(self.compresslevel)
+
+
+class _CompressionResponder:
+    """Wraps `send` for one response"""
+
+    def __init__(self, middleware: CompressionMiddleware, coding: str, send):
+        self.middleware = middleware
+        self.coding = coding
+        self._send = send
+        self.start_message = None   # held back until the first body chunk
+        self.compressor = None      # set once the response is being compressed
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if self.start_message is None:
+            # Already decided; keep going the same way
+            if self.compressor is not None and message["type"] == "http.response.body":
+                more_body = message.get("more_body", False)
+                message = {**message, "body": self.compressor.compress(message.get("body", b""), more_body)}
+            await self._send(message)
+            return
+
+        start_message, self.start_message = self.start_message, None
+        if message["type"] != "http.response.body" or not self._should_compress(start_message, message):
+            await self._send(start_message)
+            await self._send(message)
+            return
+
+        more_body = message.get("more_body", False)
+        self.compressor = self.middleware.compressor(self.coding)
+        body = self.compressor.compress(message.get("body", b""), more_body)
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        headers["Content-Encoding"] = self.coding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            # The compressed length is unknown until the stream ends
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+        await self._send({**start_message, "headers": headers.raw})
+        await self._send({**message, "body": body})
+
+    def _should_compress(self, start_message, message) -> bool:
+        if start_message["status"] in UNCOMPRESSED_STATUSES:
+            return False
+        headers = Headers(raw=start_message["headers"])
+        if "content-encoding" in headers:
+            return False
+        if headers.get("content-type", "").startswith(self.middleware.exclude_content_types):
+            return False
+        # A streamed response is compressed whatever the size of its first chunk
+        return message.get("more_body", False) or len(message.get("body", b"")) >= self.middleware.minimum_size
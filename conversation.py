@@ -0,0 +1,122 @@
+DEFAULT_MAX_HISTORY_CHARS = 24000   # budget for the rendered conversation history
+DEFAULT_KEEP_RECENT_TURNS = 2       # most recent turns always kept verbatim
+DEFAULT_TRUNCATED_OUTPUT_CHARS = 400  # size older tool outputs are cut down to
+
+HISTORY_HEADER = "\n\n=== CONVERSATION HISTORY ===\n"
+NEXT_ACTION = ("\n\n=== NEXT ACTION ===\nBased on the conversation history above, what would you like to do next? "
+               "Consider the results of your previous actions.")
+
+
+def truncate_middle(text, limit):
+    """Keep the head and tail of `text`, eliding the middle so the result is about `limit` chars"""
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    elided = len(text) - head - tail
+    return f"{text[:head]} ...[{elided} chars elided]... {text[-tail:] if tail else ''}"
+
+
+class ConversationState:
+    """Incrementally assembled agent prompt with a bounded history.
+
+    The static prefix (system prompt, user prompt and services context) is built
+    once and every turn is rendered once when it is added, so consecutive prompts
+    share a byte-identical prefix that the LLM server can reuse from its prompt
+    cache. When the history exceeds its character budget, older tool outputs are
+    truncated (and, if that is not enough, the oldest turns are dropped) in one
+    compaction step, which keeps the prefix stable again until the next one.
+
+    With Ollama, `update_context()` can hand back the `context` tokens of the
+    previous generation; `build_prompt()` then only returns the new delta
+    (the latest tool output) together with that context.
+    """
+
+    def __init__(self, system_prompt, user_prompt, services_context,
+                 max_history_chars=DEFAULT_MAX_HISTORY_CHARS,
+                 keep_recent_turns=DEFAULT_KEEP_RECENT_TURNS,
+                 truncated_output_chars=DEFAULT_TRUNCATED_OUTPUT_CHARS):
+        self.prefix = f"{system_prompt}\n{user_prompt}{services_context}"
+        self.max_history_chars = max_history_chars
+        self.keep_recent_turns = keep_recent_turns
+        self.truncated_output_chars = truncated_output_chars
+
+        self.turns = []           # (llm_response, tool_output) as recorded
+        self._rendered = []       # rendered text per kept turn, None once dropped
+        self._history_chars = 0
+        self._dropped = 0         # number of oldest turns removed from the prompt
+        self._compacted = set()   # indexes of turns whose tool output has been truncated
+
+        self.context = None       # Ollama context covering everything up to the last generation
+        self._context_turns = 0   # number of turns already covered by `context`
+
+    def __len__(self):
+        return len(self.turns)
+
+    def _render(self, index, tool_output):
+        llm_response, _ = self.turns[index]
+        return f"Round {index + 1}: LLM Request: {llm_response}\nMCP Response: {tool_output}"
+
+    def add_turn(self, llm_response, tool_output=None):
+        """Record one LLM response and the (already encoded) tool output it produced"""
+        tool_output = tool_output if tool_output else "No action taken"
+        self.turns.append((llm_response, tool_output))
+        rendered = self._render(len(self.turns) - 1, tool_output)
+        self._rendered.append(rendered)
+        self._history_chars += len(rendered) + 1
+        if self._history_chars > self.max_history_chars:
+            self._compact()
+
+    def _compact(self):
+        """Shrink the history back under budget; invalidates any reused LLM context"""
+        self.context = None
+        protected_from = max(len(self.turns) - self.keep_recent_turns, 0)
+
+        # First pass: truncate old tool outputs, oldest first
+        for index in range(self._dropped, protected_from):
+            if self._history_chars <= self.max_history_chars:
+                return
+            if index in self._compacted:
+                continue
+            _, tool_output = self.turns[index]
+            shortened = self._render(index, truncate_middle(tool_output, self.truncated_output_chars))
+            self._history_chars += len(shortened) - len(self._rendered[index])
+            self._rendered[index] = shortened
+            self._compacted.add(index)
+
+        # Second pass: drop whole turns, oldest first
+        while self._history_chars > self.max_history_chars and self._dropped < protected_from:
+            self._history_chars -= len(self._rendered[self._dropped]) + 1
+            self._rendered[self._dropped] = None
+            self._dropped += 1
+
+    def history_text(self):
+        kept = self._rendered[self._dropped:]
+        if self._dropped:
+            kept = [f"(Rounds 1-{self._dropped} omitted to stay within the context budget)"] + kept
+        return "\n".join(kept)
+
+    def build_prompt(self):
+        """Return `(prompt_text, context)` for the next LLM call.
+
+        `context` is None when the full prompt must be prefilled; otherwise the
+        prompt only holds what happened since the context was produced.
+        """
+        if not self.turns:
+            return self.prefix, None
+
+        if self.context is not None and self._context_turns == len(self.turns) - 1:
+            # The model has already seen everything up to and including its last response
+            _, tool_output = self.turns[-1]
+            return f"MCP Response: {tool_output}{NEXT_ACTION}", self.context
+
+        return f"{self.prefix}{HISTORY_HEADER}{self.history_text()}{NEXT_ACTION}", None
+
+    def update_context(self, context):
+        """Remember the context tokens returned by the latest generation.
+
+        Call this before `add_turn()` for that generation's response, so that a
+        compaction triggered by the new turn can still invalidate the context.
+        """
+        self.context = context or None
+        self._context_turns = len(self.turns)
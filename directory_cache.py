@@ -0,0 +1,134 @@
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+DEFAULT_MAX_DIRECTORIES = 256   # directories kept in the LRU
+DEFAULT_METADATA_TTL = 5.0      # seconds entry size/mtime are trusted (a child's own changes do not touch the directory mtime)
+
+
+def _entry_type(entry: os.DirEntry) -> str:
+    try:
+        if entry.is_dir():
+            return "dir"
+        if entry.is_file():
+            return "file"
+        if entry.is_symlink():
+            return "symlink"  # dangling link
+    except OSError:
+        pass
+    return "other"
+
+
+def _stat_details(path: str, name: str, entry_type: str) -> dict:
+    details = {"name": name, "type": entry_type, "size": None, "mtime": None}
+    try:
+        st = os.stat(path)
+    except OSError:
+        return details
+    details["size"] = st.st_size
+    details["mtime"] = st.st_mtime
+    return details
+
+
+class _CachedListing:
+    __slots__ = ("validator", "names", "types", "details")
+
+    def __init__(self, validator, names, types):
+        self.validator = validator
+        self.names = names
+        self.types = types
+        self.details = [None] * len(names)   # (fetched_at, dict) per entry, filled in page by page
+
+
+class DirectoryListingCache:
+    """LRU cache of sorted directory listings, validated by the directory's inode and mtime.
+
+    Listings come from a single `os.scandir` pass, using the entry type
+    information returned with the directory entries instead of one `stat`
+    per child. Adding, removing or renaming an entry changes the directory's
+    mtime, so a cached listing is served only while `(st_ino, st_mtime_ns)`
+    still match. Per-entry metadata needs a `stat` per child, so it is
+    fetched only for the page of entries asked for and cached per entry;
+    because a child's size/mtime can change without touching the directory,
+    it is additionally bounded by `metadata_ttl`.
+    """
+
+    def __init__(self, max_directories: int = DEFAULT_MAX_DIRECTORIES, metadata_ttl: float = DEFAULT_METADATA_TTL):
+        self.max_directories = max_directories
+        self.metadata_ttl = metadata_ttl
+        self._listings = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def list(self, dir_path: str, dir_stat: Optional[os.stat_result] = None, details: bool = False,
+             offset: int = 0, limit: Optional[int] = None):
+        """Return `(names, details)` for `dir_path`.
+
+        `names` are all the entries, sorted, with a trailing "/" on
+        directories. `details` is a list of dicts for the page
+        `names[offset:offset + limit]` when requested, otherwise None.
+        """
+        dir_stat = dir_stat or os.stat(dir_path)
+        validator = (dir_stat.st_ino, dir_stat.st_mtime_ns)
+
+        with self._lock:
+            listing = self._listings.get(dir_path)
+            if listing is not None and listing.validator == validator:
+                self._listings.move_to_end(dir_path)
+                self.hits += 1
+            else:
+                listing = None
+                self.misses += 1
+
+        if listing is None:
+            listing = self._scan(dir_path, validator)
+            with self._lock:
+                self._listings[dir_path] = listing
+                self._listings.move_to_end(dir_path)
+                while len(self._listings) > self.max_directories:
+                    self._listings.popitem(last=False)
+        if not details:
+            return listing.names, None
+        end = len(listing.names) if limit is None else min(len(listing.names), offset + limit)
+        return listing.names, self._page_details(dir_path, listing, offset, end)
+
+    def _page_details(self, dir_path: str, listing: _CachedListing, start: int, end: int) -> List[dict]:
+        """Details of entries `start:end`, stat-ing only those missing or older than `metadata_ttl`"""
+        now = time.monotonic()
+        page = listing.details[start:end]
+        for i, cached in enumerate(page):
+            if cached is None or now - cached[0] > self.metadata_ttl:
+                index = start + i
+                name = listing.names[index]
+                info = _stat_details(os.path.join(dir_path, name.rstrip("/")), name.rstrip("/"), listing.types[index])
+                page[i] = listing.details[index] = (now, info)
+        return [info for _, info in page]
+
+    def _scan(self, dir_path: str, validator) -> _CachedListing:
+        rows = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                entry_type = _entry_type(entry)
+                # Add trailing slash for directories to distinguish them
+                rows.append((entry.name + "/" if entry_type == "dir" else entry.name, entry_type))
+        rows.sort(key=lambda row: row[0])
+        return _CachedListing(validator, [name for name, _ in rows], [entry_type for _, entry_type in rows])
+
+    def invalidate(self, dir_path: Optional[str] = None):
+        with self._lock:
+            if dir_path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(dir_path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"directories": len(self._listings), "hits": self.hits, "misses": self.misses}
+
+
+def is_directory(dir_stat: os.stat_result) -> bool:
+    return stat.S_ISDIR(dir_stat.st_mode)
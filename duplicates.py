@@ -0,0 +1,225 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fs_walk import WalkEntry, walk_tree
+
+PARTIAL_HASH_BYTES = 64 * 1024    # hashed from both the head and the tail of a file in the first pass
+HASH_BLOCK_SIZE = 1024 * 1024
+MIN_FILES_FOR_POOL = 8            # below this, hashing in-process is cheaper than shipping work to the pool
+DEFAULT_MAX_GROUPS = 100
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_file(path: str, partial: bool) -> Optional[str]:
+    """BLAKE2b digest of a file, or of its first and last PARTIAL_HASH_BYTES when `partial`"""
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            if partial:
+                digest.update(f.read(PARTIAL_HASH_BYTES))
+                size = os.fstat(f.fileno()).st_size
+                if size > 2 * PARTIAL_HASH_BYTES:
+                    f.seek(size - PARTIAL_HASH_BYTES)
+                    digest.update(f.read(PARTIAL_HASH_BYTES))
+                elif size > PARTIAL_HASH_BYTES:
+                    digest.update(f.read())
+            else:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                    digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _hash_many(paths: List[str], partial: bool) -> List[Optional[str]]:
+    return [hash_file(path, partial) for path in paths]
+
+
+def get_hash_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Shared process pool for hashing; uses spawn so it is safe to start from a threaded server"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class HashCache:
+    """Persistent (path, size, mtime, inode) -> digest cache backed by SQLite.
+
+    An entry is reused only while the file's size, mtime and inode are
+    unchanged, which makes repeated duplicate scans incremental. The database
+    runs in WAL mode so several server processes can share it.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (path, kind))"
+        )
+        self._conn.commit()
+
+    def get_many(self, entries: Iterable[WalkEntry], kind: str) -> Dict[str, str]:
+        """Return cached digests for the entries whose size/mtime/inode still match"""
+        entries = list(entries)
+        found = {}
+        with self._lock:
+            for start in range(0, len(entries), 500):
+                chunk = {entry.path: entry for entry in entries[start:start + 500]}
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT path, size, mtime_ns, inode, digest FROM hashes WHERE kind = ? AND path IN ({placeholders})",
+                    [kind, *chunk],
+                )
+                for path, size, mtime_ns, inode, digest in rows:
+                    entry = chunk[path]
+                    if (entry.size, entry.mtime_ns, entry.inode) == (size, mtime_ns, inode):
+                        found[path] = digest
+        return found
+
+    def put_many(self, items: Iterable[Tuple[WalkEntry, str]], kind: str):
+        rows = [(entry.path, kind, entry.size, entry.mtime_ns, entry.inode, digest) for entry, digest in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DuplicateFinder:
+    """Find duplicate files: group by size, then confirm with partial and full content hashes"""
+
+    def __init__(self, cache: Optional[HashCache] = None, max_workers: Optional[int] = None):
+        self.cache = cache
+        self.max_workers = max_workers
+        self.stats = {"hashed_files": 0, "cache_hits": 0}
+
+    def _digests(self, entries: List[WalkEntry], kind: str) -> Dict[str, str]:
+        digests = self.cache.get_many(entries, kind) if self.cache else {}
+        self.stats["cache_hits"] += len(digests)
+        missing = [entry for entry in entries if entry.path not in digests]
+        if not missing:
+            return digests
+
+        paths = [entry.path for entry in missing]
+        partial = kind == "partial"
+        if len(paths) < MIN_FILES_FOR_POOL:
+            results = _hash_many(paths, partial)
+        else:
+            # Batch paths per task to keep pickling overhead low
+            pool = get_hash_pool(self.max_workers)
+            batch = max(1, len(paths) // (4 * (self.max_workers or os.cpu_count() or 1)))
+            batches = [paths[i:i + batch] for i in range(0, len(paths), batch)]
+            results = [digest for chunk in pool.map(_hash_many, batches, [partial] * len(batches)) for digest in chunk]
+        self.stats["hashed_files"] += len(paths)
+
+        computed = [(entry, digest) for entry, digest in zip(missing, results) if digest is not None]
+        if self.cache:
+            self.cache.put_many(computed, kind)
+        digests.update((entry.path, digest) for entry, digest in computed)
+        return digests
+
+    def _refine(self, groups: List[List[WalkEntry]], kind: str) -> List[Tuple[str, List[WalkEntry]]]:
+        """Split every candidate group by digest, keeping only groups that still have 2+ files"""
+        candidates = [entry for group in groups for entry in group]
+        digests = self._digests(candidates, kind)
+        refined = []
+        for group in groups:
+            by_digest = defaultdict(list)
+            for entry in group:
+                digest = digests.get(entry.path)
+                if digest is not None:
+                    by_digest[digest].append(entry)
+            refined.extend((digest, members) for digest, members in by_digest.items() if len(members) > 1)
+        return refined
+
+    def find_by_content(self, entries: Iterable[WalkEntry], min_size: int = 1) -> List[Tuple[str, List[WalkEntry]]]:
+        by_size = defaultdict(list)
+        seen_files = set()
+        for entry in entries:
+            if entry.size < min_size:
+                continue
+            # Hard links share their storage; count each file once
+            if (entry.device, entry.inode) in seen_files:
+                continue
+            seen_files.add((entry.device, entry.inode))
+            by_size[entry.size].append(entry)
+        groups = [group for group in by_size.values() if len(group) > 1]
+
+        # Cheap pass first: head+tail hash. For small files that already covers the whole content
+        refined = self._refine(groups, "partial")
+        confirmed = [(digest, group) for digest, group in refined if group[0].size <= 2 * PARTIAL_HASH_BYTES]
+        large = [group for _, group in refined if group[0].size > 2 * PARTIAL_HASH_BYTES]
+        if large:
+            confirmed.extend(self._refine(large, "full"))
+        return confirmed
+
+    @staticmethod
+    def find_by_name_and_size(entries: Iterable[WalkEntry], min_size: int = 1) -> List[Tuple[str, List[WalkEntry]]]:
+        groups = defaultdict(list)
+        for entry in entries:
+            if entry.size >= min_size:
+                groups[(os.path.basename(entry.path), entry.size)].append(entry)
+        return [(name, group) for (name, _), group in groups.items() if len(group) > 1]
+
+
+def find_duplicates(root: str, mode: str = "content", cache: Optional[HashCache] = None,
+                    min_size: int = 1, max_groups: int = DEFAULT_MAX_GROUPS, max_workers: Optional[int] = None,
+                    **walk_options) -> dict:
+    """Scan `root` for duplicate files and report groups, largest wasted space first.
+
+    `mode` is "content" (size, then partial and full hashes) or "name_size"
+    (same file name and size, no hashing). `walk_options` go to `walk_tree`.
+    """
+    entries = list(walk_tree(root, **walk_options))
+    finder = DuplicateFinder(cache, max_workers)
+    if mode == "name_size":
+        groups = finder.find_by_name_and_size(entries, min_size)
+    else:
+        groups = finder.find_by_content(entries, min_size)
+
+    groups.sort(key=lambda item: item[1][0].size * (len(item[1]) - 1), reverse=True)
+    wasted = sum(group[0].size * (len(group) - 1) for _, group in groups)
+    return {
+        "root": os.path.abspath(root),
+        "mode": mode,
+        "files_scanned": len(entries),
+        "duplicate_groups": len(groups),
+        "wasted_bytes": wasted,
+        "groups": [
+            {
+                "size": group[0].size,
+                ("name" if mode == "name_size" else "digest"): key,
+                "paths": sorted(entry.rel_path for entry in group),
+            }
+            for key, group in groups[:max_groups]
+        ],
+        "truncated": len(groups) > max_groups,
+        **finder.stats,
+    }
@@ -0,0 +1,68 @@
+import fnmatch
+import os
+from typing import Iterator, NamedTuple, Optional
+
+
+class WalkEntry(NamedTuple):
+    path: str          # absolute path
+    rel_path: str      # path relative to the walk root
+    is_dir: bool
+    size: int
+    mtime_ns: int
+    inode: int
+    device: int
+
+
+def _matches(pattern: str, name: str, rel_path: str) -> bool:
+    # Patterns containing a separator apply to the relative path, others to the file name
+    return fnmatch.fnmatch(rel_path if "/" in pattern else name, pattern)
+
+
+def walk_tree(root: str, max_depth: Optional[int] = None, pattern: Optional[str] = None,
+              include_hidden: bool = False, include_dirs: bool = False,
+              follow_symlinks: bool = False) -> Iterator[WalkEntry]:
+    """Iteratively walk `root` with `os.scandir`, yielding files (and optionally directories).
+
+    `max_depth` counts directory levels below `root` (0 = only `root` itself).
+    `pattern` is a glob applied to files. Hidden entries are skipped unless
+    `include_hidden`; unreadable directories are skipped silently. With
+    `follow_symlinks`, directory cycles are broken by tracking visited inodes.
+    """
+    root = os.path.abspath(root)
+    stack = [(root, "", 0)]
+    visited = set()
+    while stack:
+        dir_path, rel_dir, depth = stack.pop()
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            continue
+        with entries:
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                if not include_hidden and name.startswith("."):
+                    continue
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+                    if not is_dir and not entry.is_file(follow_symlinks=follow_symlinks):
+                        continue  # sockets, fifos, dangling links...
+                    st = entry.stat(follow_symlinks=follow_symlinks)
+                except OSError:
+                    continue
+
+                if is_dir:
+                    if follow_symlinks:
+                        key = (st.st_dev, st.st_ino)
+                        if key in visited:
+                            continue
+                        visited.add(key)
+                    if include_dirs:
+                        yield WalkEntry(entry.path, rel_path, True, 0, st.st_mtime_ns, st.st_ino, st.st_dev)
+                    if max_depth is None or depth < max_depth:
+                        subdirs.append((entry.path, rel_path, depth + 1))
+                elif pattern is None or _matches(pattern, name, rel_path):
+                    yield WalkEntry(entry.path, rel_path, False, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev)
+        # Reverse so directories are visited in scandir order
+        stack.extend(reversed(subdirs))
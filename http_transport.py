@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CONNECT_TIMEOUT = 3.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_FACTOR = 0.3
+DEFAULT_POOL_CONNECTIONS = 8   # number of distinct hosts kept in the pool
+DEFAULT_POOL_MAXSIZE = 16      # keep-alive connections kept per host
+DEFAULT_VALIDATOR_CACHE_ENTRIES = 256             # responses kept for If-None-Match revalidation
+DEFAULT_VALIDATOR_CACHE_BYTES = 32 * 1024 * 1024  # ... and their total body size
+
+
+class HTTPTransport:
+    """Shared HTTP transport: per-host keep-alive pools, default timeouts and bounded retries.
+
+    Wraps a single `requests.Session` so every MCP and LLM call reuses pooled
+    connections instead of paying a TCP handshake per request. Retries apply to
+    connection failures for every method and to read failures / 5xx responses
+    for idempotent methods only, with exponential backoff.
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 validator_cache_entries=DEFAULT_VALIDATOR_CACHE_ENTRIES,
+                 validator_cache_bytes=DEFAULT_VALIDATOR_CACHE_BYTES):
+        self.timeout = (connect_timeout, read_timeout)
+        self.validator_cache = ValidatorCache(validator_cache_entries, validator_cache_bytes)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def conditional_get(self, url, params=None, **kwargs):
+        """GET that revalidates a previously fetched copy instead of downloading it again.
+
+        A response that came with an ETag is remembered; the next GET of the
+        same URL and params sends If-None-Match, and a 304 returns the
+        remembered response, so an unchanged file or listing costs only
+        the round trip. Returns `(response, not_modified)`.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self.validator_cache.get(key)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        response = self.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached, True
+        if response.status_code == 200 and response.headers.get("ETag"):
+            self.validator_cache.put(key, response)
+        return response, False
+
+    def close(self):
+        self.session.close()
+
+
+class ValidatorCache:
+    """LRU of responses that carry an ETag, bounded by entry count and total body size"""
+
+    def __init__(self, max_entries=DEFAULT_VALIDATOR_CACHE_ENTRIES, max_bytes=DEFAULT_VALIDATOR_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        size = len(response.content)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.content)
+            self._entries[key] = response
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.content)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def configure_transport(config=None):
+    """(Re)build the shared transport from the `http` section of config.yaml"""
+    global _transport
+    config = config or {}
+    transport = HTTPTransport(
+        connect_timeout=config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=config.get("read_timeout", DEFAULT_READ_TIMEOUT),
+        retries=config.get("retries", DEFAULT_RETRIES),
+        backoff_factor=config.get("backoff_factor", DEFAULT_BACKOFF_FACTOR),
+        pool_connections=config.get("pool_connections", DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=config.get("pool_maxsize", DEFAULT_POOL_MAXSIZE),
+        validator_cache_entries=config.get("validator_cache_entries", DEFAULT_VALIDATOR_CACHE_ENTRIES),
+        validator_cache_bytes=config.get("validator_cache_bytes", DEFAULT_VALIDATOR_CACHE_BYTES),
+    )
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    if previous is not None:
+        previous.close()
+    return transport
+
+
+def get_transport():
+    """Return the shared transport, creating one with default settings on first use"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
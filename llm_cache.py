@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Cache modes
+READWRITE = "readwrite"   # serve hits, record misses
+RECORD = "record"         # always call the LLM and overwrite the stored completion
+REPLAY = "replay"         # only serve recorded completions; a miss is an error
+MODES = (READWRITE, RECORD, REPLAY)
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when no completion was recorded for a prompt"""
+
+
+class CompletionCache:
+    """On-disk LLM completion cache with size-bounded LRU eviction, backed by SQLite.
+
+    Entries are keyed on everything that determines a completion: provider,
+    endpoint URL, model, prompt, sampling options, the Ollama context it continues from and
+    whether generation stops at the first tool call. The stored text and the
+    provider's final stream message are returned verbatim on a hit, so a
+    replayed run behaves exactly like the recorded one.
+    """
+
+    def __init__(self, db_path, mode=READWRITE, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}'; expected one of {', '.join(MODES)}")
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL, response TEXT NOT NULL,"
+            " info TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_by_use ON completions (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(provider, base_url, model, prompt_text, options=None, context=None, stop_at_tool_call=False):
+        material = json.dumps({
+            "provider": provider,
+            # Two servers can serve different weights under the same model name
+            "base_url": base_url.rstrip("/"),
+            "model": model,
+            "prompt": hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+            "options": options or {},
+            "context": hashlib.sha256(json.dumps(context).encode("utf-8")).hexdigest() if context else None,
+            "stop_at_tool_call": bool(stop_at_tool_call),
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return `(response, info)` for `key`, or None. In record mode every lookup misses"""
+        if self.mode == RECORD:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT response, info FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        if row is None:
+            self.misses += 1
+            if self.mode == REPLAY:
+                raise CacheMiss(f"No recorded LLM completion for key {key} (llm_cache mode is replay)")
+            return None
+        self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key, provider, model, response, info=None):
+        info_text = json.dumps(info or {})
+        size = len(response.encode("utf-8")) + len(info_text)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, info_text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until both the entry and byte limits hold"""
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", doomed)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses, "mode": self.mode}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_cache(config):
+    """Build a CompletionCache from the `llm_cache` section of config.yaml, or None if disabled"""
+    config = config or {}
+    if not config.get("enabled", False):
+        return None
+    return CompletionCache(
+        config.get("path", ".llm_cache.sqlite3"),
+        mode=config.get("mode", READWRITE),
+        max_entries=config.get("max_entries", DEFAULT_MAX_ENTRIES),
+        max_bytes=config.get("max_bytes", DEFAULT_MAX_BYTES),
+    )
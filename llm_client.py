@@ -1,50 +1,162 @@
-import requests
 import json
 import os
+import time
+
+from http_transport import DEFAULT_CONNECT_TIMEOUT, get_transport
+from tool_parser import ToolCallParser
+from tracing import tracer
+
+# Generation can legitimately take minutes on a local model, so LLM calls get a longer read timeout
+DEFAULT_LLM_READ_TIMEOUT = 300.0
 
 class LLMClient:
-    def __init__(self, provider="ollama", base_url="http://localhost:11434", api_key=None):
+    def __init__(self, provider="ollama", base_url="http://localhost:11434", api_key=None,
+                 transport=None, timeout=None, options=None, cache=None):
         self.provider = provider
         self.base_url = base_url
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.transport = transport
+        self.timeout = timeout or (DEFAULT_CONNECT_TIMEOUT, DEFAULT_LLM_READ_TIMEOUT)
+        self.options = options or {}   # sampling options, e.g. temperature, seed
+        self.cache = cache             # optional llm_cache.CompletionCache
+
+    def _http(self):
+        # Resolve lazily so a transport configured after construction is still picked up
+        return self.transport or get_transport()
+
+    def prompt(self, prompt_text, model="llama2", stop_at_tool_call=False, context=None, response_info=None,
+               tool_parser=None, cancel_event=None, log=print):
+        """Return the full completion for `prompt_text`.
+
+        If a `ToolCallParser` is passed as `tool_parser`, every token is fed to it
+        as it arrives, so its calls are ready when this returns. With
+        `stop_at_tool_call`, generation is cut off as soon as a complete
+        ```tool_code block has been produced, so the caller can act on it
+        without waiting for the model to finish. See `stream()` for `context`
+        and `response_info`. Setting `cancel_event` (a threading.Event) aborts
+        the generation at the next token and returns the partial text. Progress
+        messages go to `log`.
+
+        With a completion cache, an identical request (provider, base URL, model, prompt,
+        options, context, stop_at_tool_call) is answered from disk instead.
+        """
+        if tool_parser is None and stop_at_tool_call:
+            tool_parser = ToolCallParser()
+
+        with tracer.span("llm.generate", provider=self.provider, model=model, prompt_chars=len(prompt_text)) as span:
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.key(self.provider, self.base_url, model, prompt_text, self.options, context, stop_at_tool_call)
+                cached = self.cache.get(cache_key)
+                span.set(cached=cached is not None)
+                if cached is not None:
+                    log("LLMClient: Completion served from cache")
+                    text, info = cached
+                    if response_info is not None:
+                        response_info.update(info)
+                    if tool_parser:
+                        tool_parser.feed(text)
+                        tool_parser.close()
+                    span.set(response_chars=len(text))
+                    return text
 
-    def prompt(self, prompt_text, model="llama2"):
-        print(f"LLMClient: Using {model} model via {self.provider} at {self.base_url}")
-        print(f"LLMClient: Sending prompt: {prompt_text[:100]}{'...' if len(prompt_text) > 100 else ''}")
+            if response_info is None:
+                response_info = {}  # token counts for the trace; also recorded with cached completions
+            parts = []
+            first_token_at = None
+            stopped_early = False
+            cancelled = False
+            tokens = self.stream(prompt_text, model, context=context, response_info=response_info, log=log)
+            try:
+                for token in tokens:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(token)
+                    if cancel_event is not None and cancel_event.is_set():
+                        cancelled = True
+                        break
+                    if tool_parser and tool_parser.feed(token) and stop_at_tool_call:
+                        log("LLMClient: Complete tool_code block received, stopping generation early")
+                        stopped_early = True
+                        break
+            finally:
+                # Closing the generator closes the HTTP response, which aborts generation server-side
+                tokens.close()
+            if tool_parser:
+                tool_parser.close()
+            text = "".join(parts)
+            finished_at = time.perf_counter()
+
+            # Ollama reports exact token counts; otherwise count streamed chunks (about one token each)
+            token_count = response_info.get("eval_count") or len(parts)
+            generation_seconds = finished_at - (first_token_at or finished_at)
+            if response_info.get("eval_duration"):
+                generation_seconds = response_info["eval_duration"] / 1e9
+            span.set(
+                time_to_first_token_ms=round((first_token_at - span.start) * 1000, 3) if first_token_at else None,
+                tokens=token_count,
+                prompt_tokens=response_info.get("prompt_eval_count"),
+                tokens_per_second=round(token_count / generation_seconds, 2) if generation_seconds > 0 else None,
+                response_chars=len(text),
+                stopped_early=stopped_early,
+                cancelled=cancelled,
+            )
+            if cache_key is not None and not cancelled:
+                self.cache.put(cache_key, self.provider, model, text, response_info)
+            return text
+
+    def stream(self, prompt_text, model="llama2", context=None, response_info=None, log=print):
+        """Yield completion tokens as they arrive from the provider.
+
+        `context` is an Ollama context from a previous generation to continue
+        from (ignored by cloud providers). If `response_info` is a dict, it is
+        filled with the provider's final stream message (for Ollama this
+        includes the new `context` and token counts) when the stream completes.
+        """
+        log(f"LLMClient: Using {model} model via {self.provider} at {self.base_url}")
+        log(f"LLMClient: Sending prompt: {prompt_text[:100]}{'...' if len(prompt_text) > 100 else ''}")
         
         if self.provider == "ollama":
-            return self._ollama_prompt(prompt_text, model)
+            return self._ollama_stream(prompt_text, model, context, response_info)
         elif self.provider == "cloud":
-            return self._cloud_prompt(prompt_text, model)
+            return self._cloud_stream(prompt_text, model, response_info)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
 
-    def _ollama_prompt(self, prompt_text, model):
+    def _ollama_stream(self, prompt_text, model, context=None, response_info=None):
         """Handle Ollama's streaming response format"""
-        response = requests.post(
+        payload = {"model": model, "prompt": prompt_text}
+        if context:
+            payload["context"] = context
+        if self.options:
+            payload["options"] = self.options
+        response = self._http().post(
             f"{self.base_url}/api/generate",
-            json={"model": model, "prompt": prompt_text},
-            stream=True
+            json=payload,
+            stream=True,
+            timeout=self.timeout
         )
-        response.raise_for_status()
-        
-        # Ollama returns streaming JSON responses, one per line
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    json_response = json.loads(line.decode('utf-8'))
-                    if 'response' in json_response:
-                        full_response += json_response['response']
+        try:
+            response.raise_for_status()
+
+            # Ollama returns streaming JSON responses, one per line
+            for line in response.iter_lines():
+                if line:
+                    try:
+                        json_response = json.loads(line.decode('utf-8'))
+                    except json.JSONDecodeError:
+                        continue
+                    if json_response.get('response'):
+                        yield json_response['response']
                     if json_response.get('done', False):
+                        if response_info is not None:
+                            response_info.update({k: v for k, v in json_response.items() if k != 'response'})
                         break
-                except json.JSONDecodeError:
-                    continue
-        
-        return full_response
+        finally:
+            response.close()
 
-    def _cloud_prompt(self, prompt_text, model):
-        """Handle cloud LLM API (e.g., OpenAI) standard JSON response"""
+    def _cloud_stream(self, prompt_text, model, response_info=None):
+        """Handle cloud LLM API (e.g., OpenAI) server-sent event stream"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -56,16 +168,38 @@ class LLMClient:
             "messages": [
                 {"role": "user", "content": prompt_text}
             ],
-            "max_tokens": 1000
+            "max_tokens": 1000,
+            **self.options,
+            "stream": True
         }
         
-        response = requests.post(
+        response = self._http().post(
             self.base_url,
             headers=headers,
-            json=payload
+            json=payload,
+            stream=True,
+            timeout=self.timeout
         )
-        response.raise_for_status()
-        
-        # Handle standard JSON response
-        json_response = response.json()
-        return json_response["choices"][0]["message"]["content"] 
\ No newline at end of file
+        try:
+            response.raise_for_status()
+
+            # Each event is a "data: {json}" line; the stream ends with "data: [DONE]"
+            for line in response.iter_lines():
+                if not line or not line.startswith(b"data:"):
+                    continue
+                data = line[len(b"data:"):].strip()
+                if data == b"[DONE]":
+                    if response_info is not None:
+                        response_info["done"] = True
+                    break
+                try:
+                    json_response = json.loads(data.decode('utf-8'))
+                except json.JSONDecodeError:
+                    continue
+                for choice in json_response.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
+
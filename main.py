@@ -1,265 +1,484 @@
-import yaml
-from llm_client import LLMClient
-from mcp_discovery import discover_mcp_servers
-import requests
-import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
+from conversation import (
+    DEFAULT_KEEP_RECENT_TURNS, DEFAULT_MAX_HISTORY_CHARS, DEFAULT_TRUNCATED_OUTPUT_CHARS, ConversationState
+)
+from http_transport import DEFAULT_CONNECT_TIMEOUT, configure_transport, get_transport
+from llm_cache import open_cache
+from llm_client import DEFAULT_LLM_READ_TIMEOUT, LLMClient
+from mcp_discovery import (
+    DEFAULT_DEADLINE, DEFAULT_PORTS, DEFAULT_PROBE_TIMEOUT, DEFAULT_REGISTRY_TTL, discover_mcp_services,
+    revalidate_services
+)
+from tool_parser import DEFAULT_REGISTRY, ToolCallParser, ToolRegistry, parse_natural_language, parse_tool_calls
+from prefetch import (
+    DEFAULT_MAX_CONCURRENCY as DEFAULT_PREFETCH_CONCURRENCY, DEFAULT_MAX_LISTS as DEFAULT_PREFETCH_LISTS,
+    DEFAULT_MAX_READ_BYTES as DEFAULT_PREFETCH_READ_BYTES, DEFAULT_MAX_READS as DEFAULT_PREFETCH_READS,
+    DEFAULT_TTL as DEFAULT_PREFETCH_TTL, Prefetcher
+)
+from result_encoding import DEFAULT_MAX_RESULT_CHARS, DEFAULT_MAX_ROWS, ResultEncoder
+from startup_snapshot import load_config_snapshot
+from tool_router import SERVER_ARGUMENT, ToolRouter
+from tracing import Tracer, tracer
+
+
+SERVICES_CONTEXT_FOOTER = (
+    "\nIMPORTANT: When using tools, ONLY include the tool invocation with the exact path. Do NOT include explanations or thinking in the tool call.\n"
+    "\nTool Usage Examples:\n"
+    "- To list files: ```tool_code\nlist_files /path/to/directory\n```\n"
+    "- To read a file: ```tool_code\nread_file /path/to/file\n```\n"
+    "- To use a specific server when several offer a tool: ```tool_code\nlist_files /path/to/directory server=host:port\n```\n"
+    "\nDo NOT include explanations like 'I will now list...' or 'Let me check...' in the tool invocation.\n"
+    "- Ask for more information or provide your final answer when done"
+)
 
 def load_config(path="config.yaml"):
+    import yaml  # deferred: fast starts read the config from the startup snapshot instead
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
-def execute_mcp_action(server, action, params=None):
+def execute_mcp_action(server, action, params=None, method="GET"):
     """Execute an action on the MCP server and return the response"""
-    try:
-        if action == "list":
-            response = requests.get(f"http://{server}:5000/list", params=params or {})
-        elif action == "read":
-            response = requests.get(f"http://{server}:5000/read", params=params or {})
+    http = get_transport()
+    with tracer.span("mcp.call", server=server, action=action) as span:
+        try:
+            if not action or not action.replace("_", "").isalnum():
+                return f"Unknown action: {action}"
+
+            if method == "POST":
+                response = http.post(f"http://{server}/{action}", json=params or {})
+            else:
+                # Re-reads of unchanged files and directories are answered with a 304 from the validator cache
+                response, not_modified = http.conditional_get(f"http://{server}/{action}", params=params or {})
+                span.set(not_modified=not_modified)
+            span.set(status=response.status_code, response_bytes=len(response.content))
+
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            span.set(error=str(e))
+            return f"Error executing {action}: {str(e)}"
+
+def execute_mcp_batch(server, actions, batch_action="batch", on_result=None):
+    """Execute several (action, params) pairs on one MCP server in a single request.
+
+    The server runs them concurrently and streams one NDJSON line per call as
+    it finishes; `on_result(index, result)` is called for each as it arrives.
+    Returns one result per action, in order, formatted like `execute_mcp_action`.
+    """
+    http = get_transport()
+    results = [None] * len(actions)
+    error = "no result in batch response"
+    with tracer.span("mcp.batch", server=server, calls=len(actions)) as span:
+        try:
+            payload = {"calls": [{"tool": action, "params": params or {}, "id": index}
+                                 for index, (action, params) in enumerate(actions)]}
+            with http.post(f"http://{server}/{batch_action}", json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    index = item["index"]
+                    if item.get("status") == 200:
+                        results[index] = item["result"]
+                    else:
+                        results[index] = f"Error executing {actions[index][0]}: {item.get('status')} {item.get('error')}"
+                    if on_result:
+                        on_result(index, results[index])
+        except Exception as e:
+            error = str(e)
+            span.set(error=error)
+    return [result if result is not None else f"Error executing {action}: {error}"
+            for (action, _), result in zip(actions, results)]
+
+def execute_mcp_calls(router, calls, executor=None, prefetcher=None):
+    """Run every parsed tool call concurrently, each on the server that advertises it
+    (or the one its `server=` argument names).
+
+    Calls for a server with a batch endpoint go out as one batch request.
+    Calls a `prefetcher` already made speculatively are answered from it.
+    Returns one result per call, in the same order as `calls`.
+    """
+    results = [None] * len(calls)
+    by_server = {}
+    for index, call in enumerate(calls):
+        route, params = router.route_call(call)
+        if route is None:
+            server = call.args.get(SERVER_ARGUMENT)
+            results[index] = f"Unknown tool: {call.tool}" + (f" on server {server}" if server else "")
+            continue
+        prefetched = prefetcher.lookup(route["server"], route["action"], params) if prefetcher else None
+        if prefetched is not None:
+            results[index] = prefetched
         else:
-            return f"Unknown action: {action}"
-        
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        return f"Error executing {action}: {str(e)}"
+            by_server.setdefault(route["server"], []).append((index, route, params))
+
+    def run_single(index, route, params):
+        return [(index, execute_mcp_action(route["server"], route["action"], params, route["method"]))]
+
+    def run_batch(server, batch_action, routed):
+        batch_results = execute_mcp_batch(server, [(route["action"], params) for _, route, params in routed], batch_action)
+        return [(index, result) for (index, _, _), result in zip(routed, batch_results)]
+
+    jobs = []
+    for server, routed in by_server.items():
+        batch_action = router.batch_action(server)
+        if batch_action and len(routed) > 1:
+            jobs.append((run_batch, server, batch_action, routed))
+        else:
+            jobs.extend((run_single, *item) for item in routed)
+
+    def run(job):
+        return job[0](*job[1:])
+
+    if executor is None or len(jobs) <= 1:
+        done = [run(job) for job in jobs]
+    else:
+        done = list(executor.map(tracer.bind(run), jobs))
+    for job_results in done:
+        for index, result in job_results:
+            results[index] = result
+    return results
+
+def format_mcp_results(calls, results, encoder=None):
+    """Merge tool results back into one compact conversation entry, in call order.
+
+    Pass the run's `ResultEncoder` so results repeated across turns are referenced instead of re-sent.
+    """
+    return (encoder or ResultEncoder()).encode_turn(calls, results)
+
+def print_trace_summary():
+    """Print per-stage latency so the slowest stage of the loop stands out"""
+    summary = tracer.summary()
+    if not summary:
+        return
+    print("\n=== Timing summary (ms) ===")
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total_ms"]):
+        print(f"  {name:<18} count={stats['count']:<4} total={stats['total_ms']:<10} "
+              f"mean={stats['mean_ms']:<9} p95={stats['p95_ms']}")
+    llm_spans = [span for span in tracer.spans if span.name == "llm.generate" and span.attributes.get("tokens")]
+    for span in llm_spans:
+        print(f"  llm: {span.attributes['tokens']} tokens, {span.attributes.get('tokens_per_second')} tok/s, "
+              f"first token after {span.attributes.get('time_to_first_token_ms')} ms")
 
 def parse_llm_request(llm_response):
-    """Parse LLM response to extract MCP action and parameters"""
-    llm_response_lower = llm_response.lower()
-    
-    # Check for list action
-    if any(keyword in llm_response_lower for keyword in ["list", "show files", "show directory", "list files", "list directory"]):
-        # Prioritize tool_code blocks first - these are the most reliable
-        tool_code_patterns = [
-            r'```tool_code\s*\n\s*list_files\s+([^\n]+)',
-            r'```\s*\n\s*list_files\s+([^\n]+)',
-        ]
-        
-        for pattern in tool_code_patterns:
-            match = re.search(pattern, llm_response_lower)
-            if match:
-                path = match.group(1).strip()
-                # Clean up the path
-                path = re.sub(r'[^\w/~\-\.]', '', path)  # Keep only valid path characters
-                if path and len(path) > 1:
-                    return "list", {"path": path}
-        
-        # Only if no tool_code block found, look for natural language patterns
-        # But be very strict about what constitutes a path
-        natural_patterns = [
-            r'list\s+files?\s+in\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
-            r'list\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
-            r'show\s+directory\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
-        ]
-        
-        for pattern in natural_patterns:
-            match = re.search(pattern, llm_response_lower)
-            if match:
-                path = match.group(1).strip()
-                # Clean up the path
-                path = re.sub(r'[^\w/~\-\.]', '', path)  # Keep only valid path characters
-                if path and len(path) > 1:
-                    return "list", {"path": path}
-        
-        # Default to current directory if no specific path found
-        return "list", {"path": "."}
-    
-    # Check for read action
-    elif any(keyword in llm_response_lower for keyword in ["read", "open file", "show content", "display file"]):
-        # Prioritize tool_code blocks first
-        tool_code_patterns = [
-            r'```tool_code\s*\n\s*read_file\s+([^\n]+)',
-            r'```\s*\n\s*read_file\s+([^\n]+)',
-        ]
-        
-        for pattern in tool_code_patterns:
-            match = re.search(pattern, llm_response_lower)
-            if match:
-                filename = match.group(1).strip()
-                # Clean up the filename
-                filename = re.sub(r'[^\w/~\-\.]', '', filename)  # Keep only valid path characters
-                if filename and len(filename) > 1:
-                    return "read", {"path": filename}
-        
-        # Only if no tool_code block found, look for natural language patterns
-        natural_patterns = [
-            r'read\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
-            r'read\s+file\s+["\']?([/~][^"\'\n]*)["\']?',  # Must start with / or ~
-        ]
-        
-        for pattern in natural_patterns:
-            match = re.search(pattern, llm_response_lower)
-            if match:
-                filename = match.group(1).strip()
-                # Clean up the filename
-                filename = re.sub(r'[^\w/~\-\.]', '', filename)  # Keep only valid path characters
-                if filename and len(filename) > 1:
-                    return "read", {"path": filename}
-    
-    return None, None
+    """Parse LLM response to extract the first MCP action and its parameters"""
+    calls = parse_tool_calls(llm_response, DEFAULT_REGISTRY)
+    if not calls:
+        return None, None
+    return DEFAULT_REGISTRY.lookup(calls[0].tool).endpoint, dict(calls[0].args)
 
-def main():
-    config = load_config()
-    llm_provider = config.get("llm_provider", "ollama")
-    llm_model = config.get("llm_model", "llama2")
-    ollama_port = config.get("ollama_port", 11434)
-    cloud_api_url = config.get("cloud_api_url", "")
-    system_prompt = config.get("system_prompt", "You are a helpful assistant.")
-    user_prompt = config.get("user_prompt", "List the files in the home directory.")
+def parse_llm_requests(llm_response, registry=None):
+    """Extract every tool invocation from an LLM response as a list of ToolCall, in order"""
+    return parse_tool_calls(llm_response, registry or DEFAULT_REGISTRY)
 
-    # Discover MCP servers
-    hosts = ["localhost", "raspberrypi.local"]  # Add more as needed
-    servers = discover_mcp_servers(hosts)
-    print("Discovered MCP servers:", servers)
-    
-    # Get detailed information about discovered services for learning
+def describe_services(discovered):
+    """/discover payloads with their sample listing attached, as the prompt presents them"""
+    # /discover and the sample listing were fetched during the probe; just assemble them for the prompt
     discovered_services = []
-    for server in servers:
-        try:
-            # Get comprehensive service discovery information
-            discover_response = requests.get(f"http://{server}:5000/discover")
-            print(f"Raw discover response from {server}: {discover_response.text}")
-            
-            if discover_response.status_code != 200:
-                print(f"Error: /discover endpoint returned status {discover_response.status_code}")
-                continue
-                
-            service_info = discover_response.json()
-            print(f"Parsed service info: {service_info}")
-            
-            # Validate the response structure
-            if 'server_info' not in service_info:
-                print(f"Warning: /discover response missing 'server_info' key. Available keys: {list(service_info.keys())}")
-                # Create a fallback structure
-                service_info = {
-                    'server_info': {
-                        'name': 'MCPServerFilesystem',
-                        'version': '1.0.0',
-                        'description': 'A filesystem access MCP server'
-                    },
-                    'available_tools': [],
-                    'capabilities': ['File system operations']
-                }
-            
-            # Get sample data for context
-            list_response = requests.get(f"http://{server}:5000/list", params={"path": "."})
-            available_files = list_response.json().get("files", [])
-            
-            # Add sample data to service info
-            service_info["sample_data"] = {
-                "host": server,
-                "available_files": available_files[:5]  # Show first 5 files for brevity
-            }
-            
-            discovered_services.append(service_info)
-            print(f"Service details - Host: {server}")
-            print(f"  Name: {service_info['server_info']['name']}")
-            print(f"  Description: {service_info['server_info']['description']}")
-            print(f"  Available tools: {[tool['name'] for tool in service_info.get('available_tools', [])]}")
-            print(f"  Sample files: {available_files[:5]}")
-        except Exception as e:
-            print(f"Error getting details for {server}: {e}")
-            import traceback
-            traceback.print_exc()
+    for server in discovered:
+        service_info = dict(server["service_info"])
+        available_files = server.get("sample_files", [])
+
+        # Add sample data to service info
+        service_info["sample_data"] = {
+            "host": server["address"],
+            "available_files": available_files
+        }
+
+        discovered_services.append(service_info)
+        print(f"Service details - Host: {server['address']}")
+        print(f"  Name: {service_info['server_info'].get('name', 'Unknown')}")
+        print(f"  Description: {service_info['server_info'].get('description', 'No description available')}")
+        print(f"  Available tools: {[tool.get('name') for tool in service_info.get('available_tools', [])]}")
+        print(f"  Sample files: {available_files}")
+    return discovered_services
+
+def build_services_context(discovered_services):
+    """Describe the discovered services and their tools for the static part of the prompt"""
+    if not discovered_services:
+        return "\n\nNo MCP services discovered."
+
+    parts = ["\n\nAvailable MCP Services:\n"]
+    for service in discovered_services:
+        server_info = service.get('server_info', {})
+        tools = service.get('available_tools', [])
+        sample_data = service.get('sample_data', {})
+        capabilities = service.get('capabilities', [])
 
-    # Initialize LLM client based on provider
+        parts.append(f"\n{server_info.get('name', 'Unknown')} at {sample_data.get('host', 'unknown')}:\n")
+        parts.append(f"  Description: {server_info.get('description', 'No description available')}\n")
+        parts.append(f"  Capabilities: {', '.join(capabilities)}\n")
+        parts.append("  Available tools:\n")
+        for tool in tools:
+            parts.append(f"    - {tool.get('name', 'Unknown')}: {tool.get('description', 'No description')}\n")
+            parts.append(f"      Endpoint: {tool.get('method', 'GET')} {tool.get('endpoint', '/unknown')}\n")
+            parts.append(f"      Parameters: {tool.get('parameters', {})}\n")
+        parts.append(f"  Sample files: {sample_data.get('available_files', [])}\n")
+
+    parts.append(SERVICES_CONTEXT_FOOTER)
+    return "".join(parts)
+
+def create_llm_client(config, cache=None):
+    """Build the LLM client for `config`; raises ValueError if the provider is misconfigured"""
+    llm_provider = config.get("llm_provider", "ollama")
+    http_config = config.get("http", {}) or {}
+    llm_timeout = (
+        http_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        http_config.get("llm_read_timeout", DEFAULT_LLM_READ_TIMEOUT),
+    )
+    llm_options = config.get("llm_options", {}) or {}
     if llm_provider == "ollama":
-        base_url = f"http://localhost:{ollama_port}"
-        llm = LLMClient(provider="ollama", base_url=base_url)
-    elif llm_provider == "cloud":
+        base_url = f"http://localhost:{config.get('ollama_port', 11434)}"
+        return LLMClient(provider="ollama", base_url=base_url, timeout=llm_timeout, options=llm_options, cache=cache)
+    if llm_provider == "cloud":
+        cloud_api_url = config.get("cloud_api_url", "")
         if not cloud_api_url:
-            print("Error: cloud_api_url must be specified in config.yaml for cloud provider")
-            return
-        llm = LLMClient(provider="cloud", base_url=cloud_api_url)
-    else:
-        print(f"Unknown LLM provider: {llm_provider}")
-        return
+            raise ValueError("cloud_api_url must be specified in config.yaml for cloud provider")
+        return LLMClient(provider="cloud", base_url=cloud_api_url, timeout=llm_timeout, options=llm_options, cache=cache)
+    raise ValueError(f"Unknown LLM provider: {llm_provider}")
 
-    # Build initial enhanced prompt including discovered services
-    services_context = ""
-    if discovered_services:
-        services_context = f"\n\nAvailable MCP Services:\n"
-        for service in discovered_services:
-            server_info = service.get('server_info', {})
-            tools = service.get('available_tools', [])
-            sample_data = service.get('sample_data', {})
-            capabilities = service.get('capabilities', [])
-            
-            services_context += f"\n{server_info.get('name', 'Unknown')} at {sample_data.get('host', 'unknown')}:\n"
-            services_context += f"  Description: {server_info.get('description', 'No description available')}\n"
-            services_context += f"  Capabilities: {', '.join(capabilities)}\n"
-            services_context += f"  Available tools:\n"
-            
-            for tool in tools:
-                services_context += f"    - {tool.get('name', 'Unknown')}: {tool.get('description', 'No description')}\n"
-                services_context += f"      Endpoint: {tool.get('method', 'GET')} {tool.get('endpoint', '/unknown')}\n"
-                services_context += f"      Parameters: {tool.get('parameters', {})}\n"
-            
-            services_context += f"  Sample files: {sample_data.get('available_files', [])}\n"
-        
-        services_context += f"\nIMPORTANT: When using tools, ONLY include the tool invocation with the exact path. Do NOT include explanations or thinking in the tool call.\n"
-        services_context += f"\nTool Usage Examples:\n"
-        services_context += f"- To list files: ```tool_code\nlist_files /path/to/directory\n```\n"
-        services_context += f"- To read a file: ```tool_code\nread_file /path/to/file\n```\n"
-        services_context += f"\nDo NOT include explanations like 'I will now list...' or 'Let me check...' in the tool invocation.\n"
-        services_context += f"- Ask for more information or provide your final answer when done"
-    else:
-        services_context = "\n\nNo MCP services discovered."
-    
-    conversation_history = []
-    max_iterations = 10
+class AgentResources:
+    """What every conversation of a process shares: the pooled transport, the discovered
+    servers and their tool routing, the LLM client and the tool-call executor.
+
+    All of it is read-only once built (the transport and executor are thread-safe),
+    so any number of conversations can run on one instance concurrently.
+    """
+
+    def __init__(self, config, llm, router, registry, services_context, tool_executor, llm_cache=None,
+                 prefetch_executor=None):
+        self.config = config
+        self.llm = llm
+        self.router = router
+        self.registry = registry
+        self.services_context = services_context
+        self.tool_executor = tool_executor
+        self.llm_cache = llm_cache
+        self.prefetch_executor = prefetch_executor   # set when speculative prefetch is enabled
+
+    @classmethod
+    def from_config(cls, config, snapshot=None):
+        """Build the shared resources; with fast_start enabled, discovery is reused from or saved to `snapshot`"""
+        # One pooled keep-alive transport shared by discovery, MCP actions and the LLM client
+        configure_transport(config.get("http", {}) or {})
+
+        # Fail before probing the network if the LLM provider is unusable
+        llm_cache = open_cache(config.get("llm_cache"))
+        llm = create_llm_client(config, llm_cache)
+        if llm_cache:
+            print(f"LLM completion cache: {llm_cache.stats()}")
+
+        discovery_config = config.get("discovery", {}) or {}
+        fast_start = snapshot is not None and (config.get("fast_start", {}) or {}).get("enabled", False)
+        if fast_start and snapshot.data and revalidate_services(
+                snapshot.servers, timeout=discovery_config.get("timeout", DEFAULT_PROBE_TIMEOUT)):
+            # Every recorded server still serves the same /discover payload: reuse the rendered context
+            discovered = snapshot.servers
+            services_context = snapshot.services_context
+            print(f"Fast start: reusing discovery snapshot {snapshot.path}")
+        else:
+            # Discover MCP servers: probe every candidate in parallel (or reuse the on-disk registry).
+            # A snapshot that failed revalidation means the registry is stale too
+            discovered = discover_mcp_services(
+                discovery_config.get("hosts", ["localhost", "raspberrypi.local"]),  # Add more as needed
+                ports=discovery_config.get("ports", DEFAULT_PORTS),
+                timeout=discovery_config.get("timeout", DEFAULT_PROBE_TIMEOUT),
+                deadline=discovery_config.get("deadline", DEFAULT_DEADLINE),
+                registry_path=discovery_config.get("registry_path"),
+                registry_ttl=discovery_config.get("registry_ttl", DEFAULT_REGISTRY_TTL),
+                refresh=bool(fast_start and snapshot.data),
+            )
+            services_context = build_services_context(describe_services(discovered))
+            if fast_start and discovered:
+                snapshot.save(config, discovered, services_context)
+        router = ToolRouter(discovered)
+        registry = ToolRegistry.from_discovered(discovered)
+        print("Discovered MCP servers:", [server["address"] for server in discovered])
+        print("Routable tools:", router.tool_names())
+
+        tool_executor = ThreadPoolExecutor(max_workers=config.get("max_parallel_tools", 8), thread_name_prefix="mcp-tool")
+        # Speculative calls get their own threads so they never delay the calls the LLM actually asked for
+        prefetch_config = config.get("prefetch", {}) or {}
+        prefetch_executor = None
+        if prefetch_config.get("enabled", False):
+            prefetch_executor = ThreadPoolExecutor(
+                max_workers=prefetch_config.get("max_concurrency", DEFAULT_PREFETCH_CONCURRENCY),
+                thread_name_prefix="mcp-prefetch",
+            )
+        return cls(config, llm, router, registry, services_context, tool_executor, llm_cache, prefetch_executor)
+
+    def close(self):
+        self.tool_executor.shutdown(wait=False)
+        if self.prefetch_executor:
+            self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+
+def run_conversation(resources, user_prompt, max_iterations=None, cancel_event=None, llm_slots=None, log=print):
+    """Run one agent conversation for `user_prompt` on shared `resources`.
+
+    `cancel_event` (a threading.Event) stops the conversation between steps and
+    aborts an in-flight generation; `llm_slots` (a semaphore) bounds how many
+    conversations generate at once. Progress goes to `log`. The returned
+    summary includes `timings`, the per-stage latency of this conversation
+    alone (spans still go to the global tracer as well).
+    """
+    conversation_tracer = Tracer()
+    with tracer.capture(conversation_tracer):
+        summary = _run_conversation(resources, user_prompt, max_iterations, cancel_event, llm_slots, log)
+    summary["timings"] = conversation_tracer.summary()
+    return summary
+
+def _run_conversation(resources, user_prompt, max_iterations, cancel_event, llm_slots, log):
+    config = resources.config
+    llm = resources.llm
+    llm_model = config.get("llm_model", "llama2")
+    system_prompt = config.get("system_prompt", "You are a helpful assistant.")
+    stop_at_tool_call = config.get("llm_stop_at_tool_call", True)
+    if max_iterations is None:
+        max_iterations = config.get("max_iterations", 10)
+
+    # Prompt state: static prefix built once, history appended incrementally within a char budget
+    conversation_config = config.get("conversation", {}) or {}
+    reuse_llm_context = conversation_config.get("reuse_llm_context", False)
+    conversation = ConversationState(
+        system_prompt, user_prompt, resources.services_context,
+        max_history_chars=conversation_config.get("max_history_chars", DEFAULT_MAX_HISTORY_CHARS),
+        keep_recent_turns=conversation_config.get("keep_recent_turns", DEFAULT_KEEP_RECENT_TURNS),
+        truncated_output_chars=conversation_config.get("truncated_output_chars", DEFAULT_TRUNCATED_OUTPUT_CHARS),
+    )
+    # Tool results enter the history as compact tables/text; repeats refer back to earlier results by ID
+    encoding_config = config.get("result_encoding", {}) or {}
+    result_encoder = ResultEncoder(
+        max_result_chars=encoding_config.get("max_result_chars", DEFAULT_MAX_RESULT_CHARS),
+        max_rows=encoding_config.get("max_rows", DEFAULT_MAX_ROWS),
+        reference_turns=conversation.keep_recent_turns,
+    )
+    # Optional speculative prefetch: children of the last listing are fetched while the LLM generates
+    prefetcher = None
+    if resources.prefetch_executor and resources.router:
+        prefetch_config = config.get("prefetch", {}) or {}
+        prefetcher = Prefetcher(
+            resources.router, resources.prefetch_executor, execute_mcp_action,
+            ttl=prefetch_config.get("ttl", DEFAULT_PREFETCH_TTL),
+            max_lists=prefetch_config.get("max_lists", DEFAULT_PREFETCH_LISTS),
+            max_reads=prefetch_config.get("max_reads", DEFAULT_PREFETCH_READS),
+            max_read_bytes=prefetch_config.get("max_read_bytes", DEFAULT_PREFETCH_READ_BYTES),
+        )
     iteration = 0
-    
-    while iteration < max_iterations:
+    tool_call_count = 0
+    llm_response = None
+    finished = False
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    while iteration < max_iterations and not cancelled():
         iteration += 1
-        print(f"\n=== Iteration {iteration} ===")
+        with tracer.span("iteration", iteration=iteration) as iteration_span:
+            log(f"\n=== Iteration {iteration} ===")
         
-        # Build the current prompt with conversation history
-        if iteration == 1:
-            current_prompt = f"{system_prompt}\n{user_prompt}{services_context}"
-        else:
-            # Include conversation history for context - make it more prominent
-            history_text = "\n".join([f"Round {i+1}: {msg}" for i, msg in enumerate(conversation_history)])
-            current_prompt = f"{system_prompt}\n{user_prompt}{services_context}\n\n=== CONVERSATION HISTORY ===\n{history_text}\n\n=== NEXT ACTION ===\nBased on the conversation history above, what would you like to do next? Consider the results of your previous actions."
-        
-        print(f"Current prompt length: {len(current_prompt)} characters")
-        print(f"Conversation history entries: {len(conversation_history)}")
+            # Build the current prompt: the full prompt, or only the delta when the LLM context is reused
+            with tracer.span("prompt.build"):
+                current_prompt, llm_context = conversation.build_prompt()
+            iteration_span.set(prompt_chars=len(current_prompt), history_entries=len(conversation))
         
-        # Get LLM response
-        llm_response = llm.prompt(prompt_text=current_prompt, model=llm_model)
-        print(f"LLM Response: {llm_response}")
+            log(f"Current prompt length: {len(current_prompt)} characters{' (delta on reused context)' if llm_context else ''}")
+            log(f"Conversation history entries: {len(conversation)}")
         
-        # Check if LLM is done
-        if any(keyword in llm_response.lower() for keyword in ["final answer", "i'm done", "that's all", "complete"]):
-            print("LLM indicates it's done. Final answer provided.")
-            break
+            # Get LLM response
+            # Stream the response and cut it off once a complete tool_code block is available
+            # Tool calls are parsed from the token stream as it arrives
+            response_info = {}
+            tool_parser = ToolCallParser(resources.registry)
+            with llm_slots or nullcontext():
+                llm_response = llm.prompt(prompt_text=current_prompt, model=llm_model, stop_at_tool_call=stop_at_tool_call,
+                                          context=llm_context, response_info=response_info, tool_parser=tool_parser,
+                                          cancel_event=cancel_event, log=log)
+            log(f"LLM Response: {llm_response}")
+            if cancelled():
+                break
+            if reuse_llm_context:
+                conversation.update_context(response_info.get("context"))
         
-        # Parse LLM request for MCP action
-        mcp_response = None
-        if servers:
-            action, params = parse_llm_request(llm_response)
-            if action:
-                print(f"Detected action: {action} with params: {params}")
-                mcp_response = execute_mcp_action(servers[0], action, params)
-                print(f"MCP Response ({action.upper()}): {mcp_response}")
+            # Check if LLM is done
+            if any(keyword in llm_response.lower() for keyword in ["final answer", "i'm done", "that's all", "complete"]):
+                log("LLM indicates it's done. Final answer provided.")
+                finished = True
+                break
         
-        # Add to conversation history - include both LLM request and MCP response
-        conversation_entry = f"LLM Request: {llm_response}"
-        if mcp_response:
-            conversation_entry += f"\nMCP Response: {mcp_response}"
-        else:
-            conversation_entry += f"\nMCP Response: No action taken"
+            # Parse every MCP action in the response and run them concurrently on the servers that offer them
+            mcp_response = None
+            if resources.router:
+                with tracer.span("parse"):
+                    calls = tool_parser.calls or parse_natural_language(llm_response, resources.registry)
+                if calls:
+                    log(f"Detected actions: {calls}")
+                    iteration_span.set(tool_calls=len(calls))
+                    tool_call_count += len(calls)
+                    with tracer.span("mcp", calls=len(calls)):
+                        results = execute_mcp_calls(resources.router, calls, resources.tool_executor, prefetcher)
+                    if prefetcher:
+                        prefetcher.observe(calls, results)
+                    for call, result in zip(calls, results):
+                        log(f"MCP Response ({call.tool.upper()} {call.args}): {result}")
+                    mcp_response = format_mcp_results(calls, results, result_encoder)
         
-        conversation_history.append(conversation_entry)
-        print(f"Added to conversation history. Total entries: {len(conversation_history)}")
+            # Add to conversation history - include both LLM request and MCP response
+            conversation.add_turn(llm_response, str(mcp_response) if mcp_response else None)
+            log(f"Added to conversation history. Total entries: {len(conversation)}")
         
-        # If no MCP action was taken, assume LLM is providing information
-        if not mcp_response:
-            print("No MCP action detected. LLM may be providing information or asking for clarification.")
+            # If no MCP action was taken, assume LLM is providing information
+            if not mcp_response:
+                log("No MCP action detected. LLM may be providing information or asking for clarification.")
     
-    if iteration >= max_iterations:
-        print(f"Reached maximum iterations ({max_iterations}). Stopping conversation.")
+    if prefetcher:
+        log(f"Prefetch: {prefetcher.stats()}")
+        prefetcher.close()
+    if cancelled():
+        log("Conversation cancelled.")
+    elif not finished and iteration >= max_iterations:
+        log(f"Reached maximum iterations ({max_iterations}). Stopping conversation.")
+    return {
+        "iterations": iteration,
+        "tool_calls": tool_call_count,
+        "final_response": llm_response,
+        "finished": finished,
+        "cancelled": cancelled(),
+        "prefetch": prefetcher.stats() if prefetcher else None,
+    }
+
+def run_agent(config, snapshot=None):
+    """Run the discovery + LLM + tool loop described by `config` (a parsed config.yaml).
+
+    `snapshot` (a startup_snapshot.StartupSnapshot) enables the fast-start path when
+    the config turns it on.
+
+    Returns a summary of the run, or None if the LLM provider is misconfigured.
+    """
+    try:
+        resources = AgentResources.from_config(config, snapshot)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    try:
+        summary = run_conversation(resources, config.get("user_prompt", "List the files in the home directory."))
+    finally:
+        resources.close()
+
+    if resources.llm_cache:
+        print(f"LLM completion cache: {resources.llm_cache.stats()}")
+    print_trace_summary()
+    tracing_config = config.get("tracing", {}) or {}
+    if tracing_config.get("trace_path"):
+        print(f"Trace written to {tracer.export(tracing_config['trace_path'])}")
+    return summary
+
+def main(config_path="config.yaml"):
+    config, snapshot = load_config_snapshot(config_path)
+    return run_agent(config, snapshot)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,12 +1,183 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
 
-def discover_mcp_servers(possible_hosts):
-    discovered = []
-    for host in possible_hosts:
+from http_transport import get_transport
+from tracing import tracer
+
+DEFAULT_PORTS = (5000,)
+DEFAULT_PROBE_TIMEOUT = 2.0   # per-request connect/read timeout in seconds
+DEFAULT_DEADLINE = 5.0        # overall wall-clock budget for one discovery pass
+DEFAULT_REGISTRY_TTL = 300    # seconds a registry entry is trusted without re-probing
+SAMPLE_FILE_COUNT = 5
+
+
+def _fallback_service_info():
+    """Minimal /discover payload used when a server answers with an unexpected shape"""
+    return {
+        'server_info': {
+            'name': 'MCPServerFilesystem',
+            'version': '1.0.0',
+            'description': 'A filesystem access MCP server'
+        },
+        'available_tools': [],
+        'capabilities': ['File system operations']
+    }
+
+
+def _probe(host, port, timeout):
+    """Probe one host/port: fetch /discover and a sample listing in the same pass.
+
+    Returns a server record, or None if nothing MCP-like answers.
+    """
+    with tracer.span("discovery.probe", host=host, port=port) as span:
+        server = _probe_server(host, port, timeout)
+        span.set(found=server is not None)
+        return server
+
+
+def _probe_server(host, port, timeout):
+    base_url = f"http://{host}:{port}"
+    http = get_transport()
+    try:
+        r = http.get(f"{base_url}/discover", timeout=timeout)
+        if r.status_code != 200:
+            return None
+        service_info = r.json()
+    except (requests.RequestException, ValueError):
+        return None
+    etag = r.headers.get("ETag")
+
+    if not isinstance(service_info, dict) or 'server_info' not in service_info:
+        service_info = _fallback_service_info()
+
+    sample_files = []
+    try:
+        r = http.get(f"{base_url}/list", params={"path": "."}, timeout=timeout)
+        if r.status_code == 200:
+            sample_files = r.json().get("files", [])[:SAMPLE_FILE_COUNT]
+    except (requests.RequestException, ValueError):
+        pass
+
+    return {
+        "host": host,
+        "port": port,
+        "address": f"{host}:{port}",
+        "service_info": service_info,
+        "sample_files": sample_files,
+        "etag": etag,
+    }
+
+
+def revalidate_services(servers, timeout=DEFAULT_PROBE_TIMEOUT):
+    """Return True if every server still serves the /discover payload it was recorded with.
+
+    Each server is asked with If-None-Match and must answer 304. Servers that
+    did not send an ETag when probed cannot be revalidated and count as changed.
+    """
+    with tracer.span("discovery.revalidate", servers=len(servers)) as span:
+        http = get_transport()
+        valid = all(_unchanged(http, server, timeout) for server in servers)
+        span.set(valid=valid)
+        return valid
+
+
+def _unchanged(http, server, timeout):
+    etag = server.get("etag")
+    if not etag:
+        return False
+    try:
+        r = http.get(f"http://{server['address']}/discover", headers={"If-None-Match": etag}, timeout=timeout)
+    except requests.RequestException:
+        return False
+    return r.status_code == 304
+
+
+def load_registry(registry_path, possible_hosts, ports, ttl=DEFAULT_REGISTRY_TTL):
+    """Return cached server records if the registry is fresh and was built for the same candidates"""
+    try:
+        with open(registry_path, "r") as f:
+            registry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - registry.get("saved_at", 0) > ttl:
+        return None
+    if registry.get("hosts") != list(possible_hosts) or registry.get("ports") != list(ports):
+        return None
+    return registry.get("servers") or None
+
+
+def save_registry(registry_path, possible_hosts, ports, servers):
+    """Atomically write the known-good servers to disk"""
+    registry = {
+        "saved_at": time.time(),
+        "hosts": list(possible_hosts),
+        "ports": list(ports),
+        "servers": servers,
+    }
+    directory = os.path.dirname(os.path.abspath(registry_path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{registry_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, registry_path)
+    except OSError:
+        # The registry is only an optimisation; never fail discovery because of it
         try:
-            r = requests.get(f"http://{host}:5000/list")
-            if r.status_code == 200:
-                discovered.append(host)
-        except Exception:
-            continue
-    return discovered 
\ No newline at end of file
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def discover_mcp_services(possible_hosts, ports=DEFAULT_PORTS, timeout=DEFAULT_PROBE_TIMEOUT,
+                          deadline=DEFAULT_DEADLINE, registry_path=None,
+                          registry_ttl=DEFAULT_REGISTRY_TTL, refresh=False):
+    """Probe every host/port candidate concurrently and return the MCP servers found.
+
+    Each record holds the address, the parsed /discover payload and a few sample
+    files. Hosts that do not answer within `deadline` seconds are dropped (this
+    also bounds slow name resolution such as mDNS, which request timeouts do not
+    cover). When `registry_path` is given, a fresh registry short-circuits the
+    network probe entirely and successful probes are written back to it.
+    """
+    with tracer.span("discovery", hosts=list(possible_hosts), ports=list(ports)) as span:
+        if registry_path and not refresh:
+            cached = load_registry(registry_path, possible_hosts, ports, registry_ttl)
+            if cached:
+                span.set(registry_hit=True, found=len(cached))
+                return cached
+
+        discovered = _probe_all(possible_hosts, ports, timeout, deadline)
+        span.set(registry_hit=False, found=len(discovered))
+        if registry_path and discovered:
+            save_registry(registry_path, possible_hosts, ports, discovered)
+        return discovered
+
+
+def _probe_all(possible_hosts, ports, timeout, deadline):
+    candidates = [(host, port) for host in possible_hosts for port in ports]
+    if not candidates:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="mcp-discovery")
+    try:
+        futures = [executor.submit(_probe, host, port, timeout) for host, port in candidates]
+        wait(futures, timeout=deadline)
+        # Keep candidate order so results are deterministic regardless of who answered first
+        discovered = [
+            f.result() for f in futures
+            if f.done() and not f.cancelled() and f.exception() is None and f.result()
+        ]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return discovered
+
+
+def discover_mcp_servers(possible_hosts, **kwargs):
+    """Return the addresses ("host:port") of the MCP servers found among `possible_hosts`"""
+    return [server["address"] for server in discover_mcp_services(possible_hosts, **kwargs)]
@@ -1,10 +1,84 @@
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, validate_call
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
+import argparse
+import asyncio
+import base64
+import codecs
+import hashlib
+import json
+import mmap
 import os
+import re
+import stat
+import threading
+import time
 import uvicorn
+from email.utils import formatdate
 from pathlib import Path
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote
 
-app = FastAPI()
+from directory_cache import DEFAULT_MAX_DIRECTORIES, DEFAULT_METADATA_TTL, DirectoryListingCache, is_directory
+from compression import CompressionMiddleware
+from duplicates import DEFAULT_MAX_GROUPS, HashCache, find_duplicates, shutdown_hash_pool
+from fs_walk import walk_tree
+from text_index import DEFAULT_MATCHES_PER_FILE, DEFAULT_MAX_RESULTS, TextIndex, build_query
+from tracing import EndpointMetrics, LatencyMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker process: size the threadpool sync handlers and run_in_threadpool share.
+    # Read now rather than at import: run_server sets it after this module may already be imported
+    threadpool_size = _threadpool_size()
+    if threadpool_size:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size
+    try:
+        yield
+    finally:
+        # Graceful shutdown: in-flight requests have finished (or timed out); release processes and databases
+        await run_in_threadpool(_close_resources)
+
+app = FastAPI(lifespan=lifespan)
+
+MAX_READ_SIZE = 1024 * 1024        # 1MB: whole-file JSON limit and maximum page size
+STREAM_CHUNK_SIZE = 64 * 1024      # chunk size for stream=true responses
+MMAP_MIN_LENGTH = 256 * 1024       # ranges at least this large are sliced from an mmap
+UTF8_MAX_CHAR_BYTES = 4            # longest UTF-8 encoded character
+USE_MMAP = os.environ.get("MCP_FS_MMAP", "1") != "0"
+DEFAULT_WALK_LIMIT = 10000         # files returned by one /walk call
+MAX_BATCH_CALLS = 256              # tool calls accepted by one /batch request
+DEFAULT_BATCH_CONCURRENCY = 8      # calls of one batch running at the same time
+READ_ENCODINGS = ("text", "base64", "raw")
+JSON_READ_ENCODINGS = ("text", "base64")
+# Responses at least this large are gzip/zstd-compressed for clients that accept it (0 disables compression)
+COMPRESS_MIN_SIZE = int(os.environ.get("MCP_FS_COMPRESS_MIN_SIZE", 1024))
+# Persistent caches (content hashes, ...) live here
+CACHE_DIR = os.path.expanduser(os.environ.get("MCP_FS_CACHE_DIR", "~/.cache/mcp_server_filesystem"))
+HASH_WORKERS = int(os.environ["MCP_FS_HASH_WORKERS"]) if os.environ.get("MCP_FS_HASH_WORKERS") else None
+DEFAULT_GRACEFUL_TIMEOUT = 30      # seconds in-flight requests get to finish on shutdown
+# Bounds on the blocking helpers' parameters: /batch calls them through validate_call, which
+# knows nothing about the endpoints' Query(ge=...) checks
+NonNegativeInt = Annotated[int, Field(ge=0)]
+PositiveInt = Annotated[int, Field(ge=1)]
+
+listing_cache = DirectoryListingCache(
+    max_directories=int(os.environ.get("MCP_FS_LIST_CACHE_SIZE", DEFAULT_MAX_DIRECTORIES)),
+    metadata_ttl=float(os.environ.get("MCP_FS_LIST_METADATA_TTL", DEFAULT_METADATA_TTL)),
+)
+_hash_cache = None
+_hash_cache_lock = threading.Lock()
+_text_index = None
+_text_index_lock = threading.Lock()
+metrics = EndpointMetrics()
+if COMPRESS_MIN_SIZE > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+# Added last so it wraps compression too: latency covers the compressed body as sent
+app.add_middleware(LatencyMiddleware, metrics=metrics)
 
 def validate_path(path_str: str) -> Path:
     """Validate and normalize a path for security and functionality"""
@@ -24,8 +98,17 @@ def validate_path(path_str: str) -> Path:
         raise HTTPException(status_code=400, detail=f"Invalid path '{path_str}': {str(e)}")
 
 @app.get("/discover")
-def discover_services():
-    """Return comprehensive information about available MCP services and tools"""
+def discover_services(request: Request):
+    """Return comprehensive information about available MCP services and tools.
+
+    The payload carries an ETag; clients revalidate a cached copy with If-None-Match (304 if unchanged).
+    """
+    headers = {"ETag": DISCOVERY_ETAG}
+    if request.headers.get("if-none-match") == DISCOVERY_ETAG:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=_service_description(), headers=headers)
+
+def _service_description() -> dict:
     return {
         "server_info": {
             "name": "MCPServerFilesystem",
@@ -45,11 +128,31 @@ def discover_services():
                         "default": ".",
                         "required": False,
                         "examples": ["/home/user", "/etc", ".", "~/Documents", "~"]
+                    },
+                    "details": {
+                        "type": "boolean",
+                        "description": "Also return size, modification time and type of every entry",
+                        "default": False,
+                        "required": False
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Index of the first entry to return (for paging large directories)",
+                        "default": 0,
+                        "required": False
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of entries to return",
+                        "required": False
                     }
                 },
                 "response_format": {
                     "files": "List of file and directory names",
                     "current_path": "Absolute path of the directory being listed",
+                    "total_items": "Total number of entries in the directory",
+                    "entries": "With details=true: name, type, size and mtime of each entry",
+                    "next_offset": "When paging: offset of the next page, or null on the last page",
                     "error": "Error message if operation fails"
                 },
                 "example_request": "GET /list?path=~",
@@ -60,7 +163,7 @@ def discover_services():
             },
             {
                 "name": "read_file",
-                "description": "Read the contents of a specified file (supports absolute and relative paths)",
+                "description": "Read the contents of a specified file (supports absolute and relative paths); large files can be paged with offset/length or streamed",
                 "endpoint": "/read",
                 "method": "GET",
                 "parameters": {
@@ -69,12 +172,40 @@ def discover_services():
                         "description": "File path to read (absolute or relative)",
                         "required": True,
                         "examples": ["/etc/passwd", "./config.txt", "~/file.txt"]
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Byte offset to start reading from (use next_offset from the previous page)",
+                        "default": 0,
+                        "required": False
+                    },
+                    "length": {
+                        "type": "integer",
+                        "description": "Maximum number of bytes to return (at most 1MB per request)",
+                        "required": False
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "Stream the file (or range) as chunked plain text instead of JSON",
+                        "default": False,
+                        "required": False
+                    },
+                    "encoding": {
+                        "type": "string",
+                        "description": "text: UTF-8 content in JSON; base64: any file, base64 content in JSON; raw: the bytes as application/octet-stream",
+                        "default": "text",
+                        "required": False,
+                        "examples": ["text", "base64", "raw"]
                     }
                 },
                 "response_format": {
-                    "content": "File contents as string",
+                    "content": "File contents as string (base64 with encoding=base64)",
+                    "encoding": "Present as \"base64\" when the content is base64-encoded",
                     "file_path": "Absolute path of the file that was read",
                     "file_size": "Size of the file in bytes",
+                    "offset": "Byte offset the content starts at",
+                    "length": "Number of bytes returned",
+                    "next_offset": "Offset of the next page, or null at end of file",
                     "error": "Error message if operation fails"
                 },
                 "example_request": "GET /read?path=~/config.txt",
@@ -83,41 +214,264 @@ def discover_services():
                     "file_path": "/home/user/config.txt",
                     "file_size": 1234
                 }
+            },
+            {
+                "name": "walk_tree",
+                "description": "Recursively list files below a directory with their sizes, filtered by depth and glob pattern",
+                "endpoint": "/walk",
+                "method": "GET",
+                "parameters": {
+                    "path": {
+                        "type": "string",
+                        "description": "Root directory to walk (absolute or relative)",
+                        "default": ".",
+                        "required": False
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Directory levels to descend below the root (0 = root only)",
+                        "required": False
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Glob for file names, or for relative paths if it contains '/'",
+                        "required": False,
+                        "examples": ["*.jpg", "docs/*.md"]
+                    },
+                    "include_hidden": {
+                        "type": "boolean",
+                        "description": "Include dot files and directories",
+                        "default": False,
+                        "required": False
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of files to return",
+                        "default": DEFAULT_WALK_LIMIT,
+                        "required": False
+                    }
+                },
+                "response_format": {
+                    "root": "Absolute path of the walked directory",
+                    "files": "List of {path (relative to root), size, mtime}",
+                    "total_files": "Number of matching files (may exceed the returned list)",
+                    "total_bytes": "Combined size of all matching files",
+                    "truncated": "True if more files matched than were returned"
+                },
+                "example_request": "GET /walk?path=~/Documents&pattern=*.pdf&max_depth=2"
+            },
+            {
+                "name": "find_duplicates",
+                "description": "Find duplicate files below a directory in one call: groups by size, then confirms with content hashes (cached between scans)",
+                "endpoint": "/duplicates",
+                "method": "GET",
+                "parameters": {
+                    "path": {
+                        "type": "string",
+                        "description": "Root directory to scan (absolute or relative)",
+                        "default": ".",
+                        "required": False
+                    },
+                    "mode": {
+                        "type": "string",
+                        "description": "'content' (identical bytes) or 'name_size' (same file name and size)",
+                        "default": "content",
+                        "required": False
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Directory levels to descend below the root",
+                        "required": False
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Only consider files matching this glob",
+                        "required": False
+                    },
+                    "min_size": {
+                        "type": "integer",
+                        "description": "Ignore files smaller than this many bytes",
+                        "default": 1,
+                        "required": False
+                    },
+                    "include_hidden": {
+                        "type": "boolean",
+                        "description": "Include dot files and directories",
+                        "default": False,
+                        "required": False
+                    }
+                },
+                "response_format": {
+                    "groups": "List of {size, digest or name, paths} for each set of duplicates, most wasted space first",
+                    "duplicate_groups": "Number of duplicate groups found",
+                    "wasted_bytes": "Bytes that could be reclaimed by keeping one copy per group",
+                    "files_scanned": "Number of files examined"
+                },
+                "example_request": "GET /duplicates?path=~&mode=name_size"
+            },
+            {
+                "name": "search_files",
+                "description": "Search file contents below a directory; backed by an on-disk trigram index that is refreshed incrementally",
+                "endpoint": "/search",
+                "method": "GET",
+                "parameters": {
+                    "path": {
+                        "type": "string",
+                        "description": "Root directory to search (absolute or relative)",
+                        "default": ".",
+                        "required": False
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "Text (or regular expression with regex=true) to search for",
+                        "required": True
+                    },
+                    "regex": {
+                        "type": "boolean",
+                        "description": "Treat the query as a Python regular expression",
+                        "default": False,
+                        "required": False
+                    },
+                    "case_sensitive": {
+                        "type": "boolean",
+                        "description": "Match case exactly",
+                        "default": False,
+                        "required": False
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Directory levels to descend below the root",
+                        "required": False
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Only search files matching this glob",
+                        "required": False
+                    },
+                    "include_hidden": {
+                        "type": "boolean",
+                        "description": "Include dot files and directories",
+                        "default": False,
+                        "required": False
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum number of files to return",
+                        "default": DEFAULT_MAX_RESULTS,
+                        "required": False
+                    }
+                },
+                "response_format": {
+                    "results": "List of {path (relative to root), matches, snippets: [{line, text}]}, most matches first",
+                    "total_matching_files": "Number of files containing the query",
+                    "files_searched": "Number of files considered",
+                    "truncated": "True if more files matched than were returned"
+                },
+                "example_request": "GET /search?path=~/projects&query=TODO&pattern=*.py"
             }
         ],
+        "batch_endpoint": "/batch",
         "capabilities": [
             "Full filesystem navigation",
             "Absolute and relative path support",
             "Home directory expansion (~)",
             "File content reading",
+            "Paged and streamed reads of large files",
             "Directory listing",
+            "Recursive directory walks",
+            "Duplicate file detection",
+            "Indexed content search",
+            "Batched tool calls with streamed NDJSON results (POST /batch)",
+            "Binary reads (base64 or raw bytes)",
+            "Conditional requests on /list and /read (ETag, If-None-Match, Last-Modified)",
+            "gzip/zstd response compression",
             "Path validation and security",
             "Error handling and reporting"
         ]
     }
 
+def _etag(st: os.stat_result, content: Optional[Any] = None) -> str:
+    """Weak validator from inode, mtime and size (plus a digest of `content` when the stat alone is not enough).
+
+    Weak, because the same validator covers the identity, gzip and zstd encodings of a response.
+    """
+    tag = f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+    if content is not None:
+        tag += "-" + hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+    return f'W/"{tag}"'
+
+def _validator_headers(etag: str, st: os.stat_result) -> Dict[str, str]:
+    return {"ETag": etag, "Last-Modified": formatdate(st.st_mtime, usegmt=True)}
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag` (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == opaque for tag in header.split(","))
+
+def _stat_directory(path: str) -> Tuple[Path, os.stat_result]:
+    # Validate and resolve the path
+    dir_path = validate_path(path)
+    
+    # Ensure it's a directory (this stat also validates the cached listing)
+    dir_stat = os.stat(dir_path)
+    if not is_directory(dir_stat):
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {path}")
+    return dir_path, dir_stat
+
+def _list_entries(dir_path: Path, dir_stat: os.stat_result, offset: int, limit: Optional[int], details: bool) -> dict:
+    # Sorted listing from the cache, or a fresh scandir pass if the directory changed;
+    # with details, only the entries of the requested page are stat-ed
+    names, entries = listing_cache.list(str(dir_path), dir_stat, details=details, offset=offset, limit=limit)
+    end = len(names) if limit is None else min(len(names), offset + limit)
+    
+    result = {
+        "files": names[offset:end],
+        "current_path": str(dir_path),
+        "total_items": len(names)
+    }
+    if offset or limit is not None:
+        result["offset"] = offset
+        result["next_offset"] = end if end < len(names) else None
+    if details:
+        result["entries"] = entries
+    return result
+
+def _list_directory(path: str, offset: NonNegativeInt = 0, limit: Optional[PositiveInt] = None,
+                    details: bool = False) -> dict:
+    """Blocking part of /list; runs on the threadpool"""
+    dir_path, dir_stat = _stat_directory(path)
+    return _list_entries(dir_path, dir_stat, offset, limit, details)
+
+def _conditional_list(request: Request, path: str, offset: int, limit: Optional[int], details: bool) -> Response:
+    """/list with validators: answers 304 when the client's copy is still current"""
+    dir_path, dir_stat = _stat_directory(path)
+    if not details:
+        # Names only change together with the directory's mtime, so the stat alone validates them
+        etag = _etag(dir_stat)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_validator_headers(etag, dir_stat))
+        return JSONResponse(content=_list_entries(dir_path, dir_stat, offset, limit, details),
+                            headers=_validator_headers(etag, dir_stat))
+    # A child's size/mtime can change without touching the directory: include the entries in the validator
+    result = _list_entries(dir_path, dir_stat, offset, limit, details)
+    etag = _etag(dir_stat, result["entries"])
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=_validator_headers(etag, dir_stat))
+    return JSONResponse(content=result, headers=_validator_headers(etag, dir_stat))
+
 @app.get("/list")
-def list_files(path: str = Query(".", description="Directory path to list files from")):
+async def list_files(request: Request,
+                     path: str = Query(".", description="Directory path to list files from"),
+                     offset: int = Query(0, ge=0, description="Index of the first entry to return"),
+                     limit: Optional[int] = Query(None, ge=1, description="Maximum number of entries to return"),
+                     details: bool = Query(False, description="Include size, mtime and type for each entry")):
     try:
-        # Validate and resolve the path
-        dir_path = validate_path(path)
-        
-        # Ensure it's a directory
-        if not dir_path.is_dir():
-            raise HTTPException(status_code=400, detail=f"Path is not a directory: {path}")
-        
-        # List files and directories
-        items = []
-        for item in dir_path.iterdir():
-            # Add trailing slash for directories to distinguish them
-            item_name = item.name + "/" if item.is_dir() else item.name
-            items.append(item_name)
-        
-        return {
-            "files": sorted(items),
-            "current_path": str(dir_path),
-            "total_items": len(items)
-        }
+        return await run_in_threadpool(_conditional_list, request, path, offset, limit, details)
     except HTTPException:
         raise
     except Exception as e:
@@ -126,36 +480,163 @@ def list_files(path: str = Query(".", description="Directory path to list files
             content={"error": f"Error listing directory '{path}': {str(e)}"}
         )
 
+def _resolve_file(path: str) -> Tuple[Path, os.stat_result]:
+    """Validate that `path` is a regular file and return it with its stat"""
+    file_path = validate_path(path)
+    
+    # Ensure it's a file
+    file_stat = os.stat(file_path)
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise HTTPException(status_code=400, detail=f"Path is not a file: {path}")
+    return file_path, file_stat
+
+def _read_bytes(file_path: Path, offset: int, length: int) -> bytes:
+    """Read `length` bytes at `offset`, slicing an mmap for large ranges when enabled"""
+    if length <= 0:
+        return b""
+    with open(file_path, "rb") as f:
+        if USE_MMAP and length >= MMAP_MIN_LENGTH:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[offset:offset + length]
+            except (ValueError, OSError):
+                pass  # e.g. special files that cannot be mapped; fall back to a plain read
+        f.seek(offset)
+        return f.read(length)
+
+def _read_text_range(file_path: Path, file_size: int, offset: int, length: int) -> dict:
+    """Read a byte range and decode it, holding back a multi-byte character split at the end.
+
+    A range too short for the one character at `offset` is extended to that
+    whole character, so every page makes progress.
+    """
+    data = _read_bytes(file_path, offset, min(length, max(file_size - offset, 0)))
+    at_eof = offset + len(data) >= file_size
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    content = decoder.decode(data, final=at_eof)
+    consumed = len(data) - len(decoder.getstate()[0])
+    if consumed == 0 and data:
+        # A UTF-8 character is at most 4 bytes; keep only the first one
+        data = _read_bytes(file_path, offset, min(UTF8_MAX_CHAR_BYTES, file_size - offset))
+        content = codecs.getincrementaldecoder("utf-8")().decode(data, final=False)[:1]
+        if not content:
+            raise UnicodeDecodeError("utf-8", data, 0, len(data), "truncated character")
+        consumed = len(content.encode("utf-8"))
+    next_offset = offset + consumed
+    return {
+        "content": content,
+        "file_path": str(file_path),
+        "file_size": file_size,
+        "offset": offset,
+        "length": consumed,
+        "next_offset": None if next_offset >= file_size else next_offset,
+    }
+
+def _read_base64_range(file_path: Path, file_size: int, offset: int, length: int) -> dict:
+    """Read a byte range of any file, base64-encoded"""
+    data = _read_bytes(file_path, offset, min(length, max(file_size - offset, 0)))
+    next_offset = offset + len(data)
+    return {
+        "content": base64.b64encode(data).decode("ascii"),
+        "encoding": "base64",
+        "file_path": str(file_path),
+        "file_size": file_size,
+        "offset": offset,
+        "length": len(data),
+        "next_offset": None if next_offset >= file_size else next_offset,
+    }
+
+def _page_length(file_size: int, offset: int, length: Optional[int]) -> int:
+    """Bytes one non-streamed read returns: at most MAX_READ_SIZE, 413 for an unbounded read of a larger file"""
+    if offset > file_size:
+        raise HTTPException(status_code=416, detail=f"Offset {offset} is beyond the end of the file ({file_size} bytes)")
+    if length is None:
+        # Whole-file reads keep the 1MB safety limit; larger files are paged or streamed
+        if offset == 0 and file_size > MAX_READ_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large ({file_size} bytes). Maximum size is 1MB; "
+                       f"use offset/length to page through it or stream=true.",
+            )
+        length = MAX_READ_SIZE
+    return min(length, MAX_READ_SIZE)
+
+def _read_resolved(file_path: Path, file_size: int, offset: int, length: Optional[int], encoding: str) -> dict:
+    if encoding not in JSON_READ_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown encoding '{encoding}': JSON reads use text or base64")
+    length = _page_length(file_size, offset, length)
+    if encoding == "base64":
+        return _read_base64_range(file_path, file_size, offset, length)
+    return _read_text_range(file_path, file_size, offset, length)
+
+def _read_page(path: str, offset: NonNegativeInt = 0, length: Optional[NonNegativeInt] = None,
+               encoding: str = "text") -> dict:
+    """Blocking part of a JSON /read: one page of at most MAX_READ_SIZE bytes"""
+    file_path, file_stat = _resolve_file(path)
+    return _read_resolved(file_path, file_stat.st_size, offset, length, encoding)
+
+async def _stream_file(file_path: Path, offset: int, end: int):
+    """Yield a file's bytes in chunks without holding more than one chunk in memory"""
+    with open(file_path, "rb") as f:
+        await run_in_threadpool(f.seek, offset)
+        remaining = end - offset
+        while remaining > 0:
+            chunk = await run_in_threadpool(f.read, min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
 @app.get("/read")
-def read_file(path: str = Query(..., description="File path to read")):
+async def read_file(request: Request,
+                    path: str = Query(..., description="File path to read"),
+                    offset: int = Query(0, ge=0, description="Byte offset to start reading from"),
+                    length: Optional[int] = Query(None, ge=0, description="Maximum number of bytes to read (at most 1MB per request)"),
+                    stream: bool = Query(False, description="Stream the file (or range) as chunked text instead of JSON"),
+                    encoding: str = Query("text", description="text (UTF-8 in JSON), base64 (any bytes in JSON) or raw (application/octet-stream)")):
     try:
-        # Validate and resolve the path
-        file_path = validate_path(path)
-        
-        # Ensure it's a file
-        if not file_path.is_file():
-            raise HTTPException(status_code=400, detail=f"Path is not a file: {path}")
-        
-        # Check file size for safety (limit to 1MB)
-        file_size = file_path.stat().st_size
-        if file_size > 1024 * 1024:  # 1MB limit
-            raise HTTPException(status_code=413, detail=f"File too large ({file_size} bytes). Maximum size is 1MB.")
-        
-        # Read file content
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        return {
-            "content": content,
-            "file_path": str(file_path),
-            "file_size": file_size
-        }
+        if encoding not in READ_ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"Unknown encoding '{encoding}': use one of {', '.join(READ_ENCODINGS)}")
+        if stream and encoding == "base64":
+            raise HTTPException(status_code=400, detail="stream=true sends text or raw bytes; base64 is only available in JSON reads")
+
+        # Validate and resolve the path; its stat is the validator, so an unchanged file costs a 304 and no read
+        file_path, file_stat = await run_in_threadpool(_resolve_file, path)
+        file_size = file_stat.st_size
+        etag = _etag(file_stat)
+        headers = _validator_headers(etag, file_stat)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        if stream:
+            if offset > file_size:
+                raise HTTPException(status_code=416, detail=f"Offset {offset} is beyond the end of the file ({file_size} bytes)")
+            end = file_size if length is None else min(file_size, offset + length)
+            return StreamingResponse(
+                _stream_file(file_path, offset, end),
+                media_type="application/octet-stream" if encoding == "raw" else "text/plain; charset=utf-8",
+                headers={**headers, "X-File-Path": quote(str(file_path)), "X-File-Size": str(file_size)},
+            )
+
+        if encoding == "raw":
+            # One page of bytes; X-Next-Offset tells the client where the next page starts
+            page_length = _page_length(file_size, offset, length)
+            data = await run_in_threadpool(_read_bytes, file_path, offset, min(page_length, max(file_size - offset, 0)))
+            next_offset = offset + len(data)
+            headers.update({"X-File-Path": quote(str(file_path)), "X-File-Size": str(file_size)})
+            if next_offset < file_size:
+                headers["X-Next-Offset"] = str(next_offset)
+            return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+        # Read file content (one page of at most 1MB)
+        result = await run_in_threadpool(_read_resolved, file_path, file_size, offset, length, encoding)
+        return JSONResponse(content=result, headers=headers)
     except HTTPException:
         raise
     except UnicodeDecodeError:
         return JSONResponse(
             status_code=400, 
-            content={"error": f"File '{path}' is not a text file or contains invalid encoding"}
+            content={"error": f"File '{path}' is not a text file or contains invalid encoding; read it with encoding=base64 or encoding=raw"}
         )
     except Exception as e:
         return JSONResponse(
@@ -163,6 +644,215 @@ def read_file(path: str = Query(..., description="File path to read")):
             content={"error": f"Error reading file '{path}': {str(e)}"}
         )
 
+def get_hash_cache() -> HashCache:
+    """Hash cache shared by all requests, opened on first use"""
+    global _hash_cache
+    with _hash_cache_lock:
+        if _hash_cache is None:
+            _hash_cache = HashCache(os.path.join(CACHE_DIR, "hashes.sqlite3"))
+        return _hash_cache
+
+def _resolve_directory(path: str) -> Path:
+    dir_path = validate_path(path)
+    if not dir_path.is_dir():
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {path}")
+    return dir_path
+
+def _walk(path: str = ".", max_depth: Optional[NonNegativeInt] = None, pattern: Optional[str] = None,
+          include_hidden: bool = False, limit: PositiveInt = DEFAULT_WALK_LIMIT) -> dict:
+    """Blocking part of /walk; runs on the threadpool"""
+    root = _resolve_directory(path)
+    files = []
+    total_files = 0
+    total_bytes = 0
+    for entry in walk_tree(str(root), max_depth=max_depth, pattern=pattern, include_hidden=include_hidden):
+        total_files += 1
+        total_bytes += entry.size
+        if len(files) < limit:
+            files.append({"path": entry.rel_path, "size": entry.size, "mtime": entry.mtime_ns / 1e9})
+    return {
+        "root": str(root),
+        "files": files,
+        "total_files": total_files,
+        "total_bytes": total_bytes,
+        "truncated": total_files > len(files)
+    }
+
+@app.get("/walk")
+async def walk_directory(path: str = Query(".", description="Root directory to walk"),
+                         max_depth: Optional[int] = Query(None, ge=0, description="Directory levels to descend below the root"),
+                         pattern: Optional[str] = Query(None, description="Glob for file names (or relative paths if it contains '/')"),
+                         include_hidden: bool = Query(False, description="Include dot files and directories"),
+                         limit: int = Query(DEFAULT_WALK_LIMIT, ge=1, description="Maximum number of files to return")):
+    try:
+        return await run_in_threadpool(_walk, path, max_depth, pattern, include_hidden, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Error walking directory '{path}': {str(e)}"}
+        )
+
+def _duplicates(path: str = ".", mode: str = "content", max_depth: Optional[NonNegativeInt] = None,
+                pattern: Optional[str] = None, min_size: NonNegativeInt = 1, include_hidden: bool = False,
+                max_groups: PositiveInt = DEFAULT_MAX_GROUPS) -> dict:
+    """Blocking part of /duplicates; hashing itself runs on a process pool"""
+    if mode not in ("content", "name_size"):
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}': use 'content' or 'name_size'")
+    root = _resolve_directory(path)
+    return find_duplicates(
+        str(root), mode=mode, cache=get_hash_cache(), min_size=min_size, max_groups=max_groups,
+        max_workers=HASH_WORKERS, max_depth=max_depth, pattern=pattern, include_hidden=include_hidden,
+    )
+
+@app.get("/duplicates")
+async def duplicate_files(path: str = Query(".", description="Root directory to scan"),
+                          mode: str = Query("content", pattern="^(content|name_size)$", description="'content' or 'name_size'"),
+                          max_depth: Optional[int] = Query(None, ge=0, description="Directory levels to descend below the root"),
+                          pattern: Optional[str] = Query(None, description="Only consider files matching this glob"),
+                          min_size: int = Query(1, ge=0, description="Ignore files smaller than this many bytes"),
+                          include_hidden: bool = Query(False, description="Include dot files and directories"),
+                          max_groups: int = Query(DEFAULT_MAX_GROUPS, ge=1, description="Maximum number of groups to return")):
+    try:
+        return await run_in_threadpool(_duplicates, path, mode, max_depth, pattern, min_size, include_hidden, max_groups)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Error finding duplicates in '{path}': {str(e)}"}
+        )
+
+def get_text_index() -> TextIndex:
+    """Text index shared by all requests, opened on first use"""
+    global _text_index
+    with _text_index_lock:
+        if _text_index is None:
+            _text_index = TextIndex(os.path.join(CACHE_DIR, "text_index.sqlite3"))
+        return _text_index
+
+def _search(path: str = ".", query: str = "", regex: bool = False, case_sensitive: bool = False,
+            max_depth: Optional[NonNegativeInt] = None, pattern: Optional[str] = None, include_hidden: bool = False,
+            max_results: PositiveInt = DEFAULT_MAX_RESULTS) -> dict:
+    """Blocking part of /search; runs on the threadpool"""
+    if not query:
+        raise HTTPException(status_code=400, detail="query must not be empty")
+    root = _resolve_directory(path)
+    try:
+        search_query = build_query(query, regex=regex, case_sensitive=case_sensitive)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regular expression '{query}': {str(e)}")
+    return get_text_index().search(
+        str(root), search_query, max_results=max_results, matches_per_file=DEFAULT_MATCHES_PER_FILE,
+        max_depth=max_depth, pattern=pattern, include_hidden=include_hidden,
+    )
+
+@app.get("/search")
+async def search_files(path: str = Query(".", description="Root directory to search"),
+                       query: str = Query(..., min_length=1, description="Text or regular expression to search for"),
+                       regex: bool = Query(False, description="Treat the query as a regular expression"),
+                       case_sensitive: bool = Query(False, description="Match case exactly"),
+                       max_depth: Optional[int] = Query(None, ge=0, description="Directory levels to descend below the root"),
+                       pattern: Optional[str] = Query(None, description="Only search files matching this glob"),
+                       include_hidden: bool = Query(False, description="Include dot files and directories"),
+                       max_results: int = Query(DEFAULT_MAX_RESULTS, ge=1, description="Maximum number of files to return")):
+    try:
+        return await run_in_threadpool(_search, path, query, regex, case_sensitive, max_depth, pattern,
+                                       include_hidden, max_results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Error searching '{path}': {str(e)}"}
+        )
+
+class BatchCall(BaseModel):
+    tool: str = Field(..., description="Tool name (e.g. read_file) or endpoint name (e.g. read)")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Same parameters as the tool's endpoint")
+    id: Optional[Union[str, int]] = Field(None, description="Echoed back with the result")
+
+class BatchRequest(BaseModel):
+    calls: List[BatchCall]
+    max_concurrency: int = Field(DEFAULT_BATCH_CONCURRENCY, ge=1, le=64)
+
+def _batch_handlers() -> Dict[str, Any]:
+    """Blocking implementation for each endpoint, reachable by endpoint or tool name"""
+    handlers = {
+        "list": _list_directory,
+        "read": _read_page,
+        "walk": _walk,
+        "duplicates": _duplicates,
+        "search": _search,
+        "pwd": get_current_working_directory,
+        "type": server_type,
+    }
+    # validate_call gives batched calls the same parameter coercion and checking as query strings
+    handlers = {name: validate_call(handler) for name, handler in handlers.items()}
+    for tool in _service_description()["available_tools"]:
+        endpoint = tool["endpoint"].strip("/")
+        if endpoint in handlers:
+            handlers[tool["name"]] = handlers[endpoint]
+    return handlers
+
+def _run_batch_call(handlers: Dict[str, Any], index: int, call: BatchCall) -> dict:
+    """Run one call of a batch, turning failures into the same status/error the endpoint would return"""
+    line = {"index": index, "id": call.id, "tool": call.tool}
+    handler = handlers.get(call.tool.strip("/").lower())
+    try:
+        if handler is None:
+            raise HTTPException(status_code=404, detail=f"Unknown tool: {call.tool}")
+        line["result"] = handler(**call.params)
+        line["status"] = 200
+    except HTTPException as e:
+        line.update(status=e.status_code, error=e.detail)
+    except ValidationError as e:
+        line.update(status=422, error=str(e))
+    except UnicodeDecodeError:
+        line.update(status=400, error=f"File '{call.params.get('path')}' is not a text file or contains invalid encoding; "
+                                      f"read it with encoding=base64")
+    except Exception as e:
+        line.update(status=500, error=f"Error running {call.tool}: {str(e)}")
+    return line
+
+async def _stream_batch(calls: List[BatchCall], max_concurrency: int):
+    """Run the calls concurrently on the threadpool and yield one NDJSON line per call as it finishes"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(index: int, call: BatchCall) -> dict:
+        async with semaphore:
+            return await run_in_threadpool(_run_batch_call, BATCH_HANDLERS, index, call)
+
+    tasks = [asyncio.ensure_future(run(index, call)) for index, call in enumerate(calls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done, default=str) + "\n"
+    finally:
+        # Client went away: drop the calls that have not started yet
+        for task in tasks:
+            task.cancel()
+
+@app.post("/batch")
+async def batch(request: BatchRequest):
+    """Run many tool calls in one request; results stream back as NDJSON in completion order"""
+    if len(request.calls) > MAX_BATCH_CALLS:
+        raise HTTPException(status_code=413, detail=f"Too many calls ({len(request.calls)}); at most {MAX_BATCH_CALLS} per batch")
+    return StreamingResponse(
+        _stream_batch(request.calls, request.max_concurrency),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/metrics")
+def get_metrics():
+    """Per-endpoint latency histograms and cache statistics"""
+    return {
+        **metrics.snapshot(),
+        # Each worker process keeps its own metrics and listing cache; the pid tells them apart
+        "pid": os.getpid(),
+        "listing_cache": listing_cache.stats(),
+    }
+
 @app.get("/type")
 def server_type():
     return {"type": "MCPServerFilesystem"}
@@ -172,5 +862,62 @@ def get_current_working_directory():
     """Get the current working directory of the MCP server"""
     return {"current_directory": str(Path.cwd())}
 
-def run_server(host: str = "0.0.0.0", port: int = 5000):
-    uvicorn.run("mcp_server_filesystem:app", host=host, port=port, reload=False) 
\ No newline at end of file
+BATCH_HANDLERS = _batch_handlers()
+# The tool description is fixed for the life of the process, so its hash is a stable validator
+DISCOVERY_ETAG = f'"{hashlib.sha1(json.dumps(_service_description(), sort_keys=True).encode("utf-8")).hexdigest()[:20]}"'
+
+def _threadpool_size() -> Optional[int]:
+    """Threads per worker process for blocking handlers (anyio's default is 40)"""
+    return int(os.environ["MCP_FS_THREADPOOL_SIZE"]) if os.environ.get("MCP_FS_THREADPOOL_SIZE") else None
+
+def _close_resources():
+    global _hash_cache, _text_index
+    shutdown_hash_pool()
+    with _hash_cache_lock:
+        if _hash_cache is not None:
+            _hash_cache.close()
+            _hash_cache = None
+    with _text_index_lock:
+        if _text_index is not None:
+            _text_index.close()
+            _text_index = None
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+def run_server(host: str = "0.0.0.0", port: int = 5000, workers: int = 1, threadpool_size: Optional[int] = None,
+               graceful_timeout: int = DEFAULT_GRACEFUL_TIMEOUT):
+    """Serve the app with `workers` processes sharing one listening socket.
+
+    Every worker has its own event loop and threadpool, so a long hash or walk
+    only holds up its own process. Workers share the on-disk hash cache and
+    search index in CACHE_DIR (SQLite in WAL mode); listing caches and
+    /metrics are per process. uvloop and httptools are used when installed.
+    """
+    if threadpool_size:
+        os.environ["MCP_FS_THREADPOOL_SIZE"] = str(threadpool_size)
+    if workers > 1 and not os.environ.get("MCP_FS_HASH_WORKERS"):
+        # Each worker starts its own hashing pool; split the cores between them instead of multiplying them
+        os.environ["MCP_FS_HASH_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    print(f"Serving on {host}:{port} with {workers} worker(s), {loop} event loop, {http} parser")
+    uvicorn.run("mcp_server_filesystem:app", host=host, port=port, reload=False, workers=workers,
+                loop=loop, http=http, timeout_graceful_shutdown=graceful_timeout)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filesystem MCP server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("MCP_FS_WORKERS", 1)),
+                        help="Worker processes (default: $MCP_FS_WORKERS or 1)")
+    parser.add_argument("--threads", type=int, default=_threadpool_size(), help="Threadpool size per worker")
+    parser.add_argument("--graceful-timeout", type=int, default=DEFAULT_GRACEFUL_TIMEOUT,
+                        help="Seconds in-flight requests get to finish on shutdown")
+    args = parser.parse_args()
+    run_server(args.host, args.port, workers=args.workers, threadpool_size=args.threads,
+               graceful_timeout=args.graceful_timeout)
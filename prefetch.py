@@ -0,0 +1,136 @@
+import posixpath
+import threading
+import time
+
+from tracing import tracer
+
+DEFAULT_TTL = 15.0                 # seconds a speculative result may be served
+DEFAULT_MAX_LISTS = 8              # subdirectories listed ahead per listing
+DEFAULT_MAX_READS = 8              # small files read ahead per listing (needs details=true sizes)
+DEFAULT_MAX_READ_BYTES = 64 * 1024
+DEFAULT_MAX_CONCURRENCY = 4        # speculative calls in flight
+
+
+def _key(server, action, params):
+    # The LLM may write "/a/b/" where the listing gave "/a/b", and "true" where we sent True
+    normalized = []
+    for name, value in params.items():
+        value = str(value)
+        if name == "path":
+            value = posixpath.normpath(value)
+        elif value.lower() in ("true", "false"):
+            value = value.lower()
+        normalized.append((name, value))
+    return server, action, tuple(sorted(normalized))
+
+
+class Prefetcher:
+    """Speculatively run the tool calls the agent is likely to make next.
+
+    After a turn that listed a directory, the next action is almost always
+    listing one of its subdirectories or reading one of its files. `observe`
+    queues those calls on `executor` right after the turn's results arrive,
+    so they run while the LLM is still generating. `lookup` then serves a
+    matching call from the finished (or already running) speculative call
+    instead of a new round trip. Results expire after `ttl` seconds, errors
+    are never served, and speculative calls still queued when the next turn's
+    results arrive are dropped.
+    """
+
+    def __init__(self, router, executor, fetch, ttl=DEFAULT_TTL, max_lists=DEFAULT_MAX_LISTS,
+                 max_reads=DEFAULT_MAX_READS, max_read_bytes=DEFAULT_MAX_READ_BYTES):
+        self.router = router
+        self.executor = executor
+        self.fetch = fetch   # fetch(server, action, params, method) -> result, e.g. main.execute_mcp_action
+        self.ttl = ttl
+        self.max_lists = max_lists
+        self.max_reads = max_reads
+        self.max_read_bytes = max_read_bytes
+        self._entries = {}   # key -> (expires_at, future)
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.hits = 0
+
+    def lookup(self, server, action, params):
+        """Return the speculative result for this call, or None if it has to be made for real"""
+        with self._lock:
+            entry = self._entries.get(_key(server, action, params))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        future = entry[1]
+        if not future.done() and not future.running():
+            # Still queued behind other guesses: making the call directly is faster
+            future.cancel()
+            return None
+        try:
+            result = future.result()
+        except Exception:
+            return None
+        if not isinstance(result, dict):
+            return None  # execute_mcp_action reports failures as strings
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def observe(self, calls, results):
+        """Queue likely follow-up calls for the listings among one turn's results"""
+        self._drop_queued()
+        for call, result in zip(calls, results):
+            route, params = self.router.route_call(call)
+            if route is None or route["action"] != "list":
+                continue
+            if isinstance(result, dict) and "files" in result and "current_path" in result:
+                self._schedule_children(route, params, result)
+
+    def _schedule_children(self, list_route, list_args, listing):
+        base = listing["current_path"]
+        # Children are listed the way their parent was (e.g. with details), from the start
+        list_params = {name: value for name, value in list_args.items() if name not in ("path", "offset", "limit")}
+        directories = [name for name in listing["files"] if name.endswith("/")]
+        for name in directories[:self.max_lists]:
+            self._submit(list_route, {**list_params, "path": posixpath.join(base, name.rstrip("/"))})
+
+        # Follow-up calls go to the server that produced the listing
+        read_route = self.router.route("read", list_route["server"])
+        if read_route is None:
+            return
+        # Only sizes from details=true listings tell which files are small enough to read ahead
+        small_files = [entry["name"] for entry in listing.get("entries") or []
+                       if entry.get("type") == "file" and entry.get("size") is not None
+                       and entry["size"] <= self.max_read_bytes]
+        for name in small_files[:self.max_reads]:
+            self._submit(read_route, {"path": posixpath.join(base, name)})
+
+    def _submit(self, route, params):
+        key = _key(route["server"], route["action"], params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now and not entry[1].cancelled():
+                return
+            # Speculative calls count towards the timings of the conversation that triggered them
+            future = self.executor.submit(tracer.bind(self._fetch), route, params)
+            self._entries[key] = (now + self.ttl, future)
+            self.issued += 1
+
+    def _fetch(self, route, params):
+        with tracer.span("mcp.prefetch", action=route["action"], path=params.get("path")):
+            return self.fetch(route["server"], route["action"], params, route["method"])
+
+    def _drop_queued(self):
+        """Cancel guesses that never started and forget expired ones"""
+        now = time.monotonic()
+        with self._lock:
+            for key, (expires_at, future) in list(self._entries.items()):
+                if future.cancel() or expires_at < now:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"issued": self.issued, "hits": self.hits, "cached": len(self._entries)}
+
+    def close(self):
+        with self._lock:
+            for _, future in self._entries.values():
+                future.cancel()
+            self._entries.clear()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+
+from conversation import DEFAULT_KEEP_RECENT_TURNS, truncate_middle
+
+DEFAULT_MAX_RESULT_CHARS = 4000   # per-result budget after rendering
+DEFAULT_MAX_ROWS = 200            # listing/table rows kept (head and tail) per result
+TYPE_SUFFIXES = {"dir": "/", "symlink": "@", "other": "*"}
+
+
+def _compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _human_size(size):
+    if size is None:
+        return "-"
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024 or unit == "G":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+class ResultEncoder:
+    """Render MCP tool results compactly for the conversation history.
+
+    Known result shapes are rendered as short headers plus one row per item:
+    listings, walks, duplicate groups and search hits become tables, and file
+    reads become their text. Anything else falls back to compact JSON.
+    Long tables keep their first and last rows, and long text keeps its head
+    and tail. Every result gets an ID (R1, R2, ...). A result identical to
+    one still shown verbatim in the recent history is replaced by a
+    reference to that ID, instead of being repeated on every later turn.
+    """
+
+    def __init__(self, max_result_chars=DEFAULT_MAX_RESULT_CHARS, max_rows=DEFAULT_MAX_ROWS,
+                 reference_turns=DEFAULT_KEEP_RECENT_TURNS):
+        self.max_result_chars = max_result_chars
+        self.max_rows = max_rows
+        # References must point at output the model can still see; the most recent
+        # turns are never compacted by ConversationState, older ones may be
+        self.reference_turns = reference_turns
+        self.turn = 0
+        self._next_id = 1
+        self._seen = {}   # fingerprint -> (result id, turn)
+
+    def encode_turn(self, calls, results):
+        """Encode all results of one turn, in call order, as a single history entry"""
+        self.turn += 1
+        return "\n".join(self.encode(call, result) for call, result in zip(calls, results))
+
+    def encode(self, call, result):
+        label = call.raw or f"{call.tool} {_compact_json(call.args)}"
+        fingerprint = hashlib.sha1(_compact_json(result).encode("utf-8")).hexdigest()
+        seen = self._seen.get(fingerprint)
+        if seen is not None and self.turn - seen[1] < self.reference_turns:
+            return f"[{seen[0]}] {label}: unchanged, same result as {seen[0]} above"
+
+        result_id = f"R{self._next_id}"
+        self._next_id += 1
+        self._seen[fingerprint] = (result_id, self.turn)
+        return f"[{result_id}] {label}\n{self.render(result)}"
+
+    def render(self, result):
+        if isinstance(result, dict):
+            if "files" in result and "current_path" in result:
+                text = self._render_listing(result)
+            elif "content" in result and "file_path" in result:
+                text = self._render_read(result)
+            elif "files" in result and "total_files" in result:
+                text = self._render_walk(result)
+            elif "groups" in result and "duplicate_groups" in result:
+                text = self._render_duplicates(result)
+            elif "results" in result and "total_matching_files" in result:
+                text = self._render_search(result)
+            else:
+                text = _compact_json(result)
+        elif isinstance(result, str):
+            text = result
+        else:
+            text = _compact_json(result)
+        return truncate_middle(text, self.max_result_chars)
+
+    def _rows(self, rows):
+        """Keep the first and last rows of a long table"""
+        if len(rows) <= self.max_rows:
+            return rows
+        head = self.max_rows * 2 // 3
+        tail = self.max_rows - head
+        return rows[:head] + [f"... {len(rows) - head - tail} more rows ..."] + (rows[-tail:] if tail else [])
+
+    def _render_listing(self, result):
+        header = f"dir {result['current_path']} ({result.get('total_items', len(result['files']))} items"
+        if result.get("next_offset") is not None:
+            header += f", more from offset {result['next_offset']}"
+        header += ")"
+        entries = result.get("entries")
+        if entries:
+            # Directories keep their trailing "/" and links/special files get a marker, so no type column is needed.
+            # Sizes stay exact: the agent compares them to spot duplicates
+            rows = [f"{entry['name']}{TYPE_SUFFIXES.get(entry.get('type'), '')}\t"
+                    f"{entry.get('size') if entry.get('type') == 'file' else '-'}"
+                    for entry in entries]
+            return "\n".join([header, "name\tbytes", *self._rows(rows)])
+        names = result["files"]
+        dirs = [name for name in names if name.endswith("/")]
+        files = [name for name in names if not name.endswith("/")]
+        lines = [header]
+        if dirs:
+            lines.append("dirs: " + ", ".join(self._rows(dirs)))
+        if files:
+            lines.append("files: " + ", ".join(self._rows(files)))
+        return "\n".join(lines)
+
+    def _render_read(self, result):
+        header = f"file {result['file_path']} ({result.get('file_size')} bytes"
+        if result.get("encoding"):
+            header += f", {result['encoding']}"
+        if result.get("offset"):
+            header += f", from offset {result['offset']}"
+        if result.get("next_offset") is not None:
+            header += f", more from offset {result['next_offset']}"
+        header += ")"
+        return f"{header}\n{truncate_middle(result['content'], self.max_result_chars - len(header) - 1)}"
+
+    def _render_walk(self, result):
+        header = f"walk {result.get('root')} ({result['total_files']} files, {_human_size(result.get('total_bytes'))}"
+        header += ", truncated)" if result.get("truncated") else ")"
+        rows = [f"{item.get('size')}\t{item['path']}" for item in result["files"]]
+        return "\n".join([header, "bytes\tpath", *self._rows(rows)])
+
+    def _render_duplicates(self, result):
+        header = (f"duplicates in {result.get('root')} ({result['duplicate_groups']} groups, "
+                  f"{_human_size(result.get('wasted_bytes'))} wasted, {result.get('files_scanned')} files scanned)")
+        rows = [f"{group['size']} bytes x{len(group['paths'])}: {', '.join(group['paths'])}"
+                for group in result["groups"]]
+        return "\n".join([header, *self._rows(rows)])
+
+    def _render_search(self, result):
+        header = f"search {result.get('root')} ({result['total_matching_files']} matching files)"
+        rows = []
+        for hit in result["results"]:
+            rows.append(f"{hit['path']} ({hit['matches']})")
+            rows.extend(f"  L{snippet['line']}: {snippet['text']}" for snippet in hit.get("snippets", []))
+        return "\n".join([header, *self._rows(rows)])
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import time
+
+SNAPSHOT_VERSION = 2          # bump when the snapshot layout or the rendered services context changes
+DEFAULT_SNAPSHOT_MAX_AGE = 86400
+
+
+def snapshot_path_for(config_path):
+    """Each config file gets its own snapshot next to it, e.g. `.config.yaml.snapshot.json`"""
+    directory, name = os.path.split(os.path.abspath(config_path))
+    return os.path.join(directory, f".{name}.snapshot.json")
+
+
+class StartupSnapshot:
+    """What a run resolves before its first LLM call: the parsed config, the discovered
+    servers and the rendered services context, saved so the next run can skip it.
+
+    A snapshot is keyed by the SHA-256 of the raw config file, so editing the
+    config invalidates it without parsing anything. The recorded servers are
+    revalidated against their /discover ETag before the snapshot is reused
+    (see mcp_discovery.revalidate_services), and it is rebuilt anyway once it
+    is older than `fast_start.max_age` seconds.
+    """
+
+    def __init__(self, path, config_digest, data=None):
+        self.path = path
+        self.config_digest = config_digest
+        self.data = data   # None until a matching snapshot is loaded
+
+    @classmethod
+    def load(cls, path, config_digest):
+        snapshot = cls(path, config_digest)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return snapshot
+        if data.get("version") != SNAPSHOT_VERSION or data.get("config_digest") != config_digest:
+            return snapshot
+        fast_start = data["config"].get("fast_start", {}) or {}
+        if time.time() - data.get("saved_at", 0) > fast_start.get("max_age", DEFAULT_SNAPSHOT_MAX_AGE):
+            return snapshot
+        snapshot.data = data
+        return snapshot
+
+    @property
+    def config(self):
+        return self.data["config"] if self.data else None
+
+    @property
+    def servers(self):
+        return self.data["servers"] if self.data else None
+
+    @property
+    def services_context(self):
+        return self.data["services_context"] if self.data else None
+
+    def save(self, config, servers, services_context):
+        """Atomically write the snapshot; failures are ignored, it is only an optimisation"""
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "config_digest": self.config_digest,
+            "config": config,
+            "servers": servers,
+            "services_context": services_context,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.data = data
+
+
+def load_config_snapshot(config_path):
+    """Return `(config, snapshot)` for `config_path`.
+
+    With a matching snapshot the config comes from it as JSON, so YAML is
+    neither imported nor parsed; otherwise the file is parsed as usual and
+    the (empty) snapshot is returned for the run to fill in.
+    """
+    with open(config_path, "rb") as f:
+        raw = f.read()
+    snapshot = StartupSnapshot.load(snapshot_path_for(config_path), hashlib.sha256(raw).hexdigest())
+    if snapshot.data:
+        return snapshot.config, snapshot
+    import yaml  # deferred: the snapshot path never needs it
+    return yaml.safe_load(raw), snapshot
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent_service
+from agent_service import QueueFull, create_manager
+from bench_system import agent_config, free_port, running_server
+from fake_llm import FakeLLMServer
+
+
+@pytest.fixture(scope="module")
+def backends(tmp_path_factory):
+    """A filesystem server and a fake LLM slow enough (about 1s per reply) to catch tasks mid-run"""
+    root = tmp_path_factory.mktemp("tree")
+    (root / "docs").mkdir()
+    (root / "a.txt").write_text("alpha\n")
+    (root / "b.txt").write_text("beta\n")
+    placeholders = {"root": str(root), "first_dir": str(root / "docs"),
+                    "first_file": str(root / "a.txt"), "second_file": str(root / "b.txt")}
+    with running_server(free_port()) as address, FakeLLMServer(token_delay=0.1, **placeholders) as llm:
+        yield address, llm.port
+
+
+@pytest.fixture
+def manager(backends):
+    config = agent_config(*backends)
+    config["agent_service"] = {"max_concurrent_tasks": 1, "max_queued_tasks": 2, "max_finished_tasks": 2}
+    manager = create_manager(config)
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_full_queue_is_rejected_with_429(manager, monkeypatch):
+    monkeypatch.setattr(agent_service, "manager", manager)
+    client = TestClient(agent_service.app)   # no lifespan: the manager above is used
+    running = manager.submit("first")
+    wait_for(lambda: running.status == "running")
+
+    codes = [client.post("/tasks", json={"user_prompt": f"job {i}"}).status_code for i in range(3)]
+    assert codes == [202, 202, 429]
+    assert manager.stats()["tasks"]["queued"] == 2
+    with pytest.raises(QueueFull):
+        manager.submit("direct")
+
+
+def test_cancel_queued_and_running_tasks(manager):
+    running = manager.submit("first")
+    wait_for(lambda: running.status == "running")
+    queued = manager.submit("second")
+
+    # A queued task never starts
+    manager.cancel(queued.task_id)
+    assert queued.status == "cancelled"
+    assert queued.started_at is None and queued.result is None
+
+    # A running one stops at its next token, well before the scripted conversation ends
+    manager.cancel(running.task_id)
+    wait_for(lambda: running.finished, timeout=2)
+    assert running.status == "cancelled"
+    assert running.result["cancelled"] is True
+    assert manager.cancel("unknown") is None
+
+
+def test_oldest_finished_tasks_are_pruned(manager):
+    tasks = [manager.submit(f"job {i}") for i in range(3)]
+    for task in tasks:
+        manager.cancel(task.task_id)
+    wait_for(lambda: all(task.finished for task in tasks))
+    assert [manager.get(task.task_id) for task in tasks] == tasks
+
+    # Pruning happens on submit and keeps the `max_finished_tasks` most recent
+    latest = manager.submit("job 3")
+    assert manager.get(tasks[0].task_id) is None
+    assert manager.get(tasks[1].task_id) is tasks[1]
+    assert manager.get(tasks[2].task_id) is tasks[2]
+    assert manager.get(latest.task_id) is latest
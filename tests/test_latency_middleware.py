@@ -0,0 +1,39 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from tracing import EndpointMetrics, LatencyMiddleware
+
+
+def make_client():
+    metrics = EndpointMetrics()
+    app = FastAPI()
+
+    @app.get("/items/{name}")
+    async def slow_stream(name: str):
+        async def chunks():
+            for _ in range(3):
+                await asyncio.sleep(0.02)
+                yield b"chunk\n"
+        return StreamingResponse(chunks())
+
+    app.add_middleware(LatencyMiddleware, metrics=metrics)
+    return TestClient(app), metrics
+
+
+def test_streamed_body_is_timed_to_the_last_chunk():
+    client, metrics = make_client()
+    assert client.get("/items/a?x=1").text == "chunk\n" * 3
+    endpoints = metrics.snapshot()["endpoints"]
+    assert list(endpoints) == ["GET /items/{name}"]
+    assert endpoints["GET /items/{name}"]["status"] == {"200": 1}
+    assert endpoints["GET /items/{name}"]["max_ms"] >= 60
+
+
+def test_unmatched_requests_share_one_label():
+    client, metrics = make_client()
+    client.get("/missing")
+    client.get("/other")
+    assert metrics.snapshot()["endpoints"]["GET unmatched"]["status"] == {"404": 2}
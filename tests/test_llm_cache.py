@@ -0,0 +1,24 @@
+from llm_cache import CompletionCache
+from llm_client import LLMClient
+
+
+def test_endpoints_serving_the_same_model_do_not_share_entries(tmp_path):
+    cache = CompletionCache(str(tmp_path / "llm.sqlite"))
+    calls = []
+
+    def client(base_url, text):
+        llm = LLMClient(base_url=base_url, cache=cache)
+
+        def stream(prompt_text, model, context=None, response_info=None, log=print):
+            calls.append(base_url)
+            yield text
+        llm.stream = stream
+        return llm
+
+    first = client("http://gpu-a:11434", "from a")
+    second = client("http://gpu-b:11434", "from b")
+    assert first.prompt("hi", model="llama2", log=lambda message: None) == "from a"
+    assert second.prompt("hi", model="llama2", log=lambda message: None) == "from b"
+    # A trailing slash does not make a different endpoint
+    assert client("http://gpu-a:11434/", "unused").prompt("hi", model="llama2", log=lambda message: None) == "from a"
+    assert calls == ["http://gpu-a:11434", "http://gpu-b:11434"]
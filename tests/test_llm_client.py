@@ -0,0 +1,56 @@
+import threading
+
+from llm_client import LLMClient
+from tool_parser import ToolCallParser
+
+
+def scripted_client(tokens, consumed):
+    """An LLMClient whose stream replays `tokens`, recording each one the caller pulls"""
+    client = LLMClient()
+
+    def stream(prompt_text, model="llama2", context=None, response_info=None, log=print):
+        for token in tokens:
+            consumed.append(token)
+            yield token
+
+    client.stream = stream
+    return client
+
+
+def prompt(tokens, **kwargs):
+    consumed = []
+    parser = ToolCallParser()
+    text = scripted_client(tokens, consumed).prompt("hi", tool_parser=parser, log=lambda message: None, **kwargs)
+    return text, consumed, parser.calls
+
+
+def test_stops_after_the_newline_that_follows_the_closing_fence():
+    tokens = ["Sure.\n```tool", "_code\nlist_files /tmp\n", "```", "\n", "Now I will", " explain..."]
+    text, consumed, calls = prompt(tokens, stop_at_tool_call=True)
+    # The bare closing fence is not enough: its line could still grow, e.g. into ```python
+    assert consumed == tokens[:4]
+    assert text == "".join(tokens[:4])
+    assert [(call.tool, call.args) for call in calls] == [("list_files", {"path": "/tmp"})]
+
+
+def test_blocks_without_recognised_calls_do_not_stop_generation():
+    tokens = ["```python\n", "print('hi')\n", "```\n", "```tool_code\n", "read_file /etc/hosts\n", "```\n", "tail"]
+    text, consumed, calls = prompt(tokens, stop_at_tool_call=True)
+    assert consumed == tokens[:6]
+    assert [(call.tool, call.args) for call in calls] == [("read_file", {"path": "/etc/hosts"})]
+
+
+def test_without_stop_at_tool_call_the_whole_response_is_generated():
+    tokens = ["```tool_code\n", "list_files /tmp\n", "```\n", "and more"]
+    text, consumed, calls = prompt(tokens, stop_at_tool_call=False)
+    assert consumed == tokens
+    assert text == "".join(tokens)
+    assert len(calls) == 1
+
+
+def test_cancel_event_returns_the_partial_text():
+    cancel_event = threading.Event()
+    cancel_event.set()
+    text, consumed, _ = prompt(["one ", "two ", "three"], cancel_event=cancel_event)
+    assert text == "one "
+    assert consumed == ["one "]
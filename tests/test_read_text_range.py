@@ -0,0 +1,41 @@
+from mcp_server_filesystem import _read_page
+
+
+def read_all(path, length):
+    """Page through a file with next_offset the way a client would"""
+    pages = []
+    offset = 0
+    while offset is not None:
+        page = _read_page(path, offset=offset, length=length)
+        assert page["length"] > 0
+        pages.append(page)
+        offset = page["next_offset"]
+        assert len(pages) <= 100
+    return pages
+
+
+def test_length_shorter_than_one_character(tmp_path):
+    path = tmp_path / "accents.txt"
+    path.write_text("é" * 10, encoding="utf-8")
+    page = _read_page(str(path), offset=0, length=1)
+    assert page["content"] == "é"
+    assert page["length"] == 2
+    assert page["next_offset"] == 2
+
+
+def test_pages_never_split_a_character(tmp_path):
+    text = "aé€😀" * 5   # 1-, 2-, 3- and 4-byte characters
+    path = tmp_path / "mixed.txt"
+    path.write_text(text, encoding="utf-8")
+    for length in (1, 2, 3, 5, 7):
+        pages = read_all(str(path), length)
+        assert "".join(page["content"] for page in pages) == text
+        assert pages[-1]["next_offset"] is None
+
+
+def test_split_at_the_end_of_a_page_is_held_back(tmp_path):
+    path = tmp_path / "euro.txt"
+    path.write_text("ab€cd", encoding="utf-8")
+    page = _read_page(str(path), offset=0, length=3)   # "ab" plus the first byte of "€"
+    assert page["content"] == "ab"
+    assert page["next_offset"] == 2
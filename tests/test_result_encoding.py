@@ -0,0 +1,92 @@
+from result_encoding import ResultEncoder
+from tool_parser import ToolCall
+
+LISTING = {
+    "current_path": "/data",
+    "files": ["docs/", "a.txt", "link"],
+    "total_items": 3,
+    "entries": [
+        {"name": "docs", "type": "dir"},
+        {"name": "a.txt", "type": "file", "size": 1234},
+        {"name": "link", "type": "symlink"},
+    ],
+}
+
+
+def call(tool="list_files", path="/data"):
+    return ToolCall(tool, {"path": path}, f"{tool} {path}")
+
+
+def test_listing():
+    assert ResultEncoder().render(LISTING) == "dir /data (3 items)\nname\tbytes\ndocs/\t-\na.txt\t1234\nlink@\t-"
+
+
+def test_listing_without_details():
+    result = {"current_path": "/data", "files": ["docs/", "a.txt", "b.txt"], "next_offset": 3}
+    assert ResultEncoder().render(result) == "dir /data (3 items, more from offset 3)\ndirs: docs/\nfiles: a.txt, b.txt"
+
+
+def test_read():
+    result = {"file_path": "/data/a.txt", "content": "hello\n", "file_size": 6, "encoding": "utf-8",
+              "offset": 0, "next_offset": None}
+    assert ResultEncoder().render(result) == "file /data/a.txt (6 bytes, utf-8)\nhello\n"
+
+
+def test_read_page():
+    result = {"file_path": "/data/a.txt", "content": "lo", "file_size": 6, "offset": 3, "next_offset": 5}
+    assert ResultEncoder().render(result) == "file /data/a.txt (6 bytes, from offset 3, more from offset 5)\nlo"
+
+
+def test_walk():
+    result = {"root": "/data", "total_files": 2, "total_bytes": 3072, "truncated": True,
+              "files": [{"path": "/data/a.txt", "size": 1024}, {"path": "/data/b.txt", "size": 2048}]}
+    assert ResultEncoder().render(result) == (
+        "walk /data (2 files, 3.0K, truncated)\nbytes\tpath\n1024\t/data/a.txt\n2048\t/data/b.txt")
+
+
+def test_duplicates():
+    result = {"root": "/data", "duplicate_groups": 1, "wasted_bytes": 10, "files_scanned": 5,
+              "groups": [{"size": 10, "paths": ["/data/a.txt", "/data/copy.txt"]}]}
+    assert ResultEncoder().render(result) == (
+        "duplicates in /data (1 groups, 10B wasted, 5 files scanned)\n10 bytes x2: /data/a.txt, /data/copy.txt")
+
+
+def test_search():
+    result = {"root": "/data", "total_matching_files": 1,
+              "results": [{"path": "/data/a.txt", "matches": 2,
+                           "snippets": [{"line": 3, "text": "needle"}, {"line": 9, "text": "needles"}]}]}
+    assert ResultEncoder().render(result) == (
+        "search /data (1 matching files)\n/data/a.txt (2)\n  L3: needle\n  L9: needles")
+
+
+def test_unknown_shape_falls_back_to_compact_json():
+    assert ResultEncoder().render({"error": "Path not allowed", "code": 403}) == '{"error":"Path not allowed","code":403}'
+    assert ResultEncoder().render([1, "é"]) == '[1,"é"]'
+
+
+def test_long_tables_keep_head_and_tail_rows():
+    result = {"root": "/data", "total_files": 10, "truncated": False,
+              "files": [{"path": f"/data/{i}", "size": i} for i in range(10)]}
+    lines = ResultEncoder(max_rows=6).render(result).split("\n")
+    assert lines[2:] == ["0\t/data/0", "1\t/data/1", "2\t/data/2", "3\t/data/3", "... 4 more rows ...",
+                         "8\t/data/8", "9\t/data/9"]
+    assert len(ResultEncoder(max_rows=10).render(result).split("\n")) == 12
+
+
+def test_repeat_within_the_window_becomes_a_reference():
+    encoder = ResultEncoder(reference_turns=2)
+    first = encoder.encode_turn([call()], [LISTING])
+    assert first.startswith("[R1] list_files /data\ndir /data")
+    again = encoder.encode_turn([call(), call("read_file", "/data/a.txt")], [LISTING, "other"])
+    assert again == ("[R1] list_files /data: unchanged, same result as R1 above\n"
+                     "[R2] read_file /data/a.txt\nother")
+
+
+def test_repeat_after_the_window_is_re_emitted_under_a_new_id():
+    encoder = ResultEncoder(reference_turns=2)
+    encoder.encode_turn([call()], [LISTING])
+    encoder.encode_turn([call("read_file", "/data/a.txt")], ["other"])
+    later = encoder.encode_turn([call()], [LISTING])
+    assert later.startswith("[R3] list_files /data\ndir /data (3 items)")
+    # The new ID is what later references point at
+    assert encoder.encode_turn([call()], [LISTING]) == "[R3] list_files /data: unchanged, same result as R3 above"
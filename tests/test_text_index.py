@@ -0,0 +1,58 @@
+import os
+import threading
+
+from text_index import TextIndex, _required_literal, build_query
+
+
+def make_tree(root, files=300):
+    for i in range(files):
+        directory = os.path.join(root, f"dir{i % 10}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.txt"), "w") as f:
+            f.write(f"line one\nneedle {i}\n" if i % 3 == 0 else "nothing to see\n")
+
+
+def test_concurrent_searches_index_the_same_files(tmp_path):
+    root = tmp_path / "tree"
+    make_tree(str(root))
+    index = TextIndex(str(tmp_path / "cache" / "text_index.sqlite3"))
+    query = build_query("needle")
+    threads = 4
+    barrier = threading.Barrier(threads)
+    results, errors = [], []
+
+    def search():
+        barrier.wait()
+        try:
+            results.append(index.search(str(root), query, max_results=1000))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=search) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    index.close()
+
+    assert errors == []
+    assert [result["total_matching_files"] for result in results] == [100] * threads
+
+    # Every file made it into the index once: the next search narrows down instead of re-scanning
+    index = TextIndex(str(tmp_path / "cache" / "text_index.sqlite3"))
+    result = index.search(str(root), query, max_results=1000)
+    index.close()
+    assert result["files_searched"] == 300
+    assert result["scanned_unindexed"] == 0
+    assert result["indexed_candidates"] == 100
+    assert result["total_matching_files"] == 100
+
+
+def test_required_literal():
+    assert _required_literal("foo.*barbaz") == "barbaz"
+    assert _required_literal("foo|bar") is None
+    assert _required_literal("ab[cd]e") is None
+    # Inline flags change what the literal text means (e.g. verbose mode ignores spaces)
+    assert _required_literal("(?x) a b c d") is None
+    assert _required_literal("(?i)needle") is None
+    assert _required_literal("(?s:needle)") is None
@@ -0,0 +1,82 @@
+from tool_parser import ToolCall, ToolCallParser, ToolRegistry, parse_natural_language, parse_tool_calls
+
+
+def calls_of(text, registry=None):
+    return [(call.tool, call.args) for call in parse_tool_calls(text, registry)]
+
+
+def test_fenced_block_calls_keep_case_and_order():
+    text = ("Let me look.\n```tool_code\nlist_files /Users/Me/Documents\n"
+            "read_file /Users/Me/Notes.TXT\n```\nDone.")
+    assert calls_of(text) == [
+        ("list_files", {"path": "/Users/Me/Documents"}),
+        ("read_file", {"path": "/Users/Me/Notes.TXT"}),
+    ]
+
+
+def test_call_syntax_and_quoted_paths():
+    assert calls_of('```tool_code\nlist_files("/Library/Application Support")\n```') == [
+        ("list_files", {"path": "/Library/Application Support"})]
+    assert calls_of("```\nread_file '/tmp/a b.txt'\n```") == [("read_file", {"path": "/tmp/a b.txt"})]
+    # Unquoted words form one value, so paths with spaces survive
+    assert calls_of("```\nlist_files /Tax Returns/2023\n```") == [("list_files", {"path": "/Tax Returns/2023"})]
+
+
+def test_single_line_block_with_info_string():
+    assert calls_of("```tool_code list_files /tmp```") == [("list_files", {"path": "/tmp"})]
+    assert calls_of("```list_files /tmp```") == [("list_files", {"path": "/tmp"})]
+
+
+def test_unknown_tools_and_code_blocks_are_ignored():
+    text = "```python\nimport os\nprint(os.listdir('/tmp'))\n```\n```tool_code\nlist_files /tmp\n```"
+    assert calls_of(text) == [("list_files", {"path": "/tmp"})]
+
+
+def test_unterminated_block_counts_as_closed():
+    assert calls_of("```tool_code\nread_file /etc/hosts") == [("read_file", {"path": "/etc/hosts"})]
+
+
+def test_server_argument_is_kept_for_the_router():
+    assert calls_of("```\nlist_files /data server=10.0.0.5:8000\n```") == [
+        ("list_files", {"path": "/data", "server": "10.0.0.5:8000"})]
+
+
+def test_streamed_calls_arrive_once_the_closing_fence_line_ends():
+    parser = ToolCallParser()
+    assert parser.feed("```tool_code\nlist_fi") == []
+    assert parser.feed("les /tmp\n```") == []   # the fence line is not complete yet
+    assert parser.feed("\nMore text") == [ToolCall("list_files", {"path": "/tmp"}, "list_files /tmp")]
+    assert len(parser.close()) == 1
+
+
+def test_parse_matches_feed_and_close():
+    text = "intro\n```tool_code\nlist_files /a\n```\n```read_file /b```\n```\nread_file /c"
+    streamed = ToolCallParser()
+    for char in text:
+        streamed.feed(char)
+    assert ToolCallParser().parse(text) == streamed.close()
+
+
+def test_registry_from_discovered_servers():
+    servers = [
+        {"address": "a:8000", "service_info": {"available_tools": [
+            {"name": "search_files", "endpoint": "/search", "parameters": {
+                "query": {"type": "string"}, "max_results": {"type": "integer"}, "regex": {"type": "boolean"}}},
+        ]}},
+        {"address": "b:8000", "service_info": {}},   # no tools advertised: the defaults
+    ]
+    registry = ToolRegistry.from_discovered(servers)
+    assert "search_files" in registry and "SEARCH" in registry and "list_files" in registry
+    assert calls_of("```\nsearch_files TODO max_results=5 regex=true\n```", registry) == [
+        ("search_files", {"query": "TODO", "max_results": 5, "regex": True})]
+    # Calls are reported by advertised name, also when written with the endpoint name
+    assert calls_of("```\nsearch(query='x')\n```", registry) == [("search_files", {"query": "x"})]
+
+
+def test_natural_language_fallback():
+    assert calls_of("Let me read /etc/hosts.") == [("read_file", {"path": "/etc/hosts"})]
+    assert calls_of("I'll List files in ~/Documents next") == [("list_files", {"path": "~/Documents"})]
+    assert calls_of("Final answer: there are no duplicates.") == []
+    # Only used when no fenced block produced calls
+    assert calls_of("I will read /etc/hosts\n```\nlist_files /tmp\n```") == [("list_files", {"path": "/tmp"})]
+    assert parse_natural_language("read /") == []   # a bare "/" is too vague to act on
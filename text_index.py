@@ -0,0 +1,265 @@
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from fs_walk import WalkEntry, walk_tree
+
+MAX_INDEX_FILE_SIZE = 1024 * 1024        # larger text files are not indexed, only scanned
+MAX_SCAN_FILE_SIZE = 16 * 1024 * 1024    # larger files are skipped entirely
+BINARY_SNIFF_BYTES = 8192
+SNIPPET_CONTEXT = 80                     # characters kept either side of a match
+DEFAULT_MAX_RESULTS = 50
+DEFAULT_MATCHES_PER_FILE = 5
+
+# File status in the index
+TEXT, LARGE, BINARY = "text", "large", "binary"
+
+REGEX_META = set(".^$*+?{}[]\\|()")
+# `(?i)`, `(?x)`, `(?s:...)` etc. change how the literal text of a pattern matches
+INLINE_FLAGS_PATTERN = re.compile(r"\(\?[aiLmsux-]")
+
+
+class SearchQuery(NamedTuple):
+    pattern: re.Pattern
+    required_literal: Optional[str]   # must occur (case-insensitively) in every matching file
+
+
+def build_query(query: str, regex: bool = False, case_sensitive: bool = False) -> SearchQuery:
+    flags = 0 if case_sensitive else re.IGNORECASE
+    literal = _required_literal(query) if regex else query
+    if literal and not case_sensitive and not literal.isascii():
+        literal = None  # the index only folds ASCII case
+    return SearchQuery(re.compile(query if regex else re.escape(query), flags), literal)
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """Longest run of plain characters every match of `pattern` must contain (conservative)"""
+    if "|" in pattern or INLINE_FLAGS_PATTERN.search(pattern):
+        return None
+    runs, run, depth, i = [], [], 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        next_char = pattern[i + 1] if i + 1 < len(pattern) else ""
+        if char == "\\":
+            runs.append("".join(run))
+            run = []
+            i += 2
+            continue
+        if char in "([":
+            runs.append("".join(run))
+            run = []
+            depth += 1
+            if char == "[":
+                # Skip the whole character class
+                close = pattern.find("]", i + 2)
+                i = close + 1 if close > 0 else len(pattern)
+                depth -= 1
+                continue
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and char not in REGEX_META and next_char not in ("?", "*", "{"):
+            run.append(char)
+        else:
+            runs.append("".join(run))
+            run = []
+        i += 1
+    runs.append("".join(run))
+    longest = max(runs, key=len)
+    return longest if len(longest) >= 3 else None
+
+
+def trigrams(data: bytes) -> Set[int]:
+    """Distinct lowercase byte trigrams of `data`, packed into integers"""
+    data = data.lower()
+    return {int.from_bytes(gram, "big") for gram in {data[i:i + 3] for i in range(len(data) - 2)}}
+
+
+class FileScan(NamedTuple):
+    status: str
+    grams: Optional[Set[int]]
+    matches: int
+    snippets: List[dict]
+
+
+def scan_file(path: str, size: int, query: Optional[SearchQuery], index: bool,
+              matches_per_file: int = DEFAULT_MATCHES_PER_FILE) -> Optional[FileScan]:
+    """Read one file once: classify it, optionally extract trigrams, and collect matches"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_SCAN_FILE_SIZE)
+    except OSError:
+        return None
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return FileScan(BINARY, None, 0, [])
+    status = TEXT if size <= MAX_INDEX_FILE_SIZE else LARGE
+    grams = trigrams(data) if index and status == TEXT else None
+    if query is None:
+        return FileScan(status, grams, 0, [])
+
+    text = data.decode("utf-8", errors="replace")
+    count = 0
+    snippets = []
+    last_line_start = -1
+    for match in query.pattern.finditer(text):
+        count += 1
+        if len(snippets) < matches_per_file:
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            if line_start == last_line_start:
+                continue  # one snippet per line
+            last_line_start = line_start
+            line_end = text.find("\n", match.end())
+            line_end = len(text) if line_end < 0 else line_end
+            start = max(line_start, match.start() - SNIPPET_CONTEXT)
+            end = min(line_end, match.end() + SNIPPET_CONTEXT)
+            snippets.append({
+                "line": text.count("\n", 0, match.start()) + 1,
+                "text": ("..." if start > line_start else "") + text[start:end] + ("..." if end < line_end else ""),
+            })
+    return FileScan(status, grams, count, snippets)
+
+
+class TextIndex:
+    """Persistent trigram index over file contents, refreshed incrementally by mtime.
+
+    Every search walks the requested tree and compares size/mtime/inode with
+    the index. Unchanged files are narrowed down with the trigram postings of
+    the query's required literal and only those candidates are read; new or
+    changed files are scanned directly (in parallel) and re-indexed in the
+    same pass, so the index catches up as a side effect of searching.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 8):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, status TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " trigram INTEGER NOT NULL, file_id INTEGER NOT NULL, PRIMARY KEY (trigram, file_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_by_file ON postings (file_id);"
+        )
+        self._conn.commit()
+
+    def _indexed_files(self, root: str) -> Dict[str, tuple]:
+        prefix = root.rstrip("/") + "/"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, id, size, mtime_ns, inode, status FROM files WHERE path >= ? AND path < ?",
+                (prefix, prefix[:-1] + "0"),  # "0" sorts right after "/"
+            ).fetchall()
+        return {path: rest for path, *rest in rows}
+
+    def _candidates(self, file_ids: List[int], literal: str) -> Set[int]:
+        grams = sorted(trigrams(literal.encode("utf-8")))
+        if not grams or not file_ids:
+            return set(file_ids)
+        placeholders = ",".join("?" * len(grams))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT file_id FROM postings WHERE trigram IN ({placeholders})"
+                " GROUP BY file_id HAVING COUNT(*) = ?",
+                [*grams, len(grams)],
+            ).fetchall()
+        return {file_id for (file_id,) in rows} & set(file_ids)
+
+    def _store(self, scanned: List[tuple], removed: List[int]):
+        """Write re-scanned files (and drop deleted ones) in one transaction"""
+        with self._lock, self._conn:
+            for file_id in removed:
+                self._conn.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+                self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            for entry, result in scanned:
+                # Replace by path, not by the id seen before scanning: a concurrent search
+                # (or another worker process) may have indexed the same file since then
+                self._conn.execute(
+                    "DELETE FROM postings WHERE file_id IN (SELECT id FROM files WHERE path = ?)", (entry.path,))
+                self._conn.execute("DELETE FROM files WHERE path = ?", (entry.path,))
+                cursor = self._conn.execute(
+                    "INSERT INTO files (path, size, mtime_ns, inode, status) VALUES (?, ?, ?, ?, ?)",
+                    (entry.path, entry.size, entry.mtime_ns, entry.inode, result.status),
+                )
+                if result.grams:
+                    self._conn.executemany(
+                        "INSERT INTO postings (trigram, file_id) VALUES (?, ?)",
+                        ((gram, cursor.lastrowid) for gram in result.grams),
+                    )
+
+    def search(self, root: str, query: SearchQuery, max_results: int = DEFAULT_MAX_RESULTS,
+               matches_per_file: int = DEFAULT_MATCHES_PER_FILE, **walk_options) -> dict:
+        root = os.path.abspath(root)
+        indexed = self._indexed_files(root)
+        current = [entry for entry in walk_tree(root, **walk_options) if entry.size <= MAX_SCAN_FILE_SIZE]
+        current_paths = {entry.path for entry in current}
+
+        stale: List[WalkEntry] = []      # new or changed: scan and re-index
+        unchanged: Dict[int, WalkEntry] = {}
+        large: List[WalkEntry] = []      # known text files too large to index: always scanned
+        for entry in current:
+            known = indexed.get(entry.path)
+            if known and tuple(known[1:4]) == (entry.size, entry.mtime_ns, entry.inode):
+                if known[4] == TEXT:
+                    unchanged[known[0]] = entry
+                elif known[4] == LARGE:
+                    large.append(entry)
+            else:
+                stale.append(entry)
+        # Only files inside the walked scope count as deleted (filters may hide others)
+        removed = [known[0] for path, known in indexed.items()
+                   if path not in current_paths and not _excluded_by_walk(path, root, walk_options)]
+
+        if query.required_literal:
+            candidate_ids = self._candidates(list(unchanged), query.required_literal)
+        else:
+            candidate_ids = set(unchanged)
+        to_verify = [unchanged[file_id] for file_id in candidate_ids] + large
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="text-search") as pool:
+            stale_results = list(pool.map(
+                lambda entry: scan_file(entry.path, entry.size, query, True, matches_per_file), stale))
+            verified = list(pool.map(
+                lambda entry: scan_file(entry.path, entry.size, query, False, matches_per_file), to_verify))
+
+        self._store([(entry, result) for entry, result in zip(stale, stale_results) if result is not None], removed)
+
+        hits = []
+        for entry, result in zip(stale + to_verify, stale_results + verified):
+            if result is not None and result.matches:
+                hits.append((entry, result))
+        # Rank: more matches first, then matches in the file name, then shorter paths
+        needle = (query.required_literal or "").lower()
+        hits.sort(key=lambda hit: (-hit[1].matches, needle not in os.path.basename(hit[0].path).lower(),
+                                   len(hit[0].rel_path), hit[0].rel_path))
+        return {
+            "root": root,
+            "files_searched": len(current),
+            "indexed_candidates": len(to_verify) - len(large),
+            "scanned_unindexed": len(stale) + len(large),
+            "total_matching_files": len(hits),
+            "results": [
+                {"path": entry.rel_path, "matches": result.matches, "snippets": result.snippets}
+                for entry, result in hits[:max_results]
+            ],
+            "truncated": len(hits) > max_results,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _excluded_by_walk(path: str, root: str, walk_options: dict) -> bool:
+    """True if a walk with these options could not have seen `path` even if it still exists"""
+    if walk_options.get("pattern") or walk_options.get("max_depth") is not None:
+        return True
+    if not walk_options.get("include_hidden"):
+        rel = os.path.relpath(path, root)
+        return any(part.startswith(".") for part in rel.split(os.sep))
+    return False
@@ -0,0 +1,282 @@
+import re
+from typing import NamedTuple
+
+from tool_router import DEFAULT_TOOLS, SERVER_ARGUMENT
+
+FENCE = "```"
+# Arguments: key=value pairs, quoted strings, bare words and (in call syntax) comma separators
+ARG_TOKEN_PATTERN = re.compile(r'''(?:([A-Za-z_]\w*)\s*=\s*)?("[^"]*"|'[^']*'|[^\s,"'=]+)|(,)''')
+# `tool_name args...` or `tool_name(args...)`
+CALL_PATTERN = re.compile(r'^\s*([A-Za-z_]\w*)\s*(?:\((.*)\)\s*;?|(?:\s(.*))?)$')
+# Fast path for the common `tool_name /some/path` form: no quotes, keywords or call syntax
+SIMPLE_CALL_PATTERN = re.compile(r'''^\s*([A-Za-z_]\w*)\s+([^"'=(),`\s][^"'=(),`]*)$''')
+# Natural language fallback, case-insensitive but matched against the original text
+NATURAL_PATTERN = re.compile(
+    r'''\b(list\s+files?\s+in|list|show\s+directory|read\s+file|read)\s+["']?([/~][^"'\s]*)''',
+    re.IGNORECASE,
+)
+NATURAL_ACTIONS = {"list": "list_files", "show": "list_files", "read": "read_file"}
+TRAILING_PUNCTUATION = ".,;:`"
+TRAILING_WHITESPACE_PUNCTUATION = " \t\r.,;:"
+
+
+class ToolSpec(NamedTuple):
+    name: str
+    endpoint: str
+    parameters: tuple  # ((name, type), ...) in the order the server advertises them
+
+    @property
+    def first_parameter(self):
+        return self.parameters[0] if self.parameters else ("path", "string")
+
+
+class ToolCall(NamedTuple):
+    tool: str
+    args: dict
+    raw: str = ""
+
+    @property
+    def path(self):
+        return self.args.get("path")
+
+
+class ToolRegistry:
+    """Tool names and parameter schemas, generated from servers' /discover payloads"""
+
+    def __init__(self, tools=None):
+        self._specs = {}
+        for tool in tools if tools is not None else DEFAULT_TOOLS:
+            self.add(tool)
+
+    @classmethod
+    def from_discovered(cls, discovered_servers):
+        tools = []
+        for server in discovered_servers:
+            tools.extend(server.get("service_info", {}).get("available_tools") or DEFAULT_TOOLS)
+        return cls(tools)
+
+    def add(self, tool):
+        endpoint = tool.get("endpoint", "").strip("/")
+        name = tool.get("name") or endpoint
+        if not name:
+            return
+        parameters = tuple(
+            (param, (schema or {}).get("type", "string"))
+            for param, schema in tool.get("parameters", {}).items()
+        )
+        spec = ToolSpec(name, endpoint, parameters)
+        # Aliases are matched case-insensitively; the first server to advertise a name wins
+        for alias in (name, endpoint):
+            if alias:
+                self._specs.setdefault(alias.lower(), spec)
+
+    def lookup(self, name):
+        return self._specs.get(name.lower())
+
+    def __contains__(self, name):
+        return name.lower() in self._specs
+
+
+DEFAULT_REGISTRY = ToolRegistry()
+
+
+def _coerce(value, value_type):
+    if value_type == "string":
+        return value
+    try:
+        if value_type == "integer":
+            return int(value)
+        if value_type == "number":
+            return float(value)
+        if value_type == "boolean":
+            return value.lower() in ("1", "true", "yes", "on")
+    except ValueError:
+        pass
+    return value
+
+
+def _unquote(token):
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in "\"'":
+        return token[1:-1]
+    return token.strip(TRAILING_PUNCTUATION) if token not in (".", "..") else token
+
+
+def parse_call(line, registry):
+    """Parse one line of a tool block into a ToolCall, or None if it is not a known tool"""
+    match = SIMPLE_CALL_PATTERN.match(line)
+    if match:
+        tool, value = match.groups()
+        spec = registry.lookup(tool)
+        if spec is None:
+            return None
+        name, value_type = spec.first_parameter
+        value = value.rstrip(TRAILING_WHITESPACE_PUNCTUATION) or value
+        if value_type != "string":
+            value = _coerce(value, value_type)
+        return ToolCall(spec.name, {name: value}, line.strip())
+
+    match = CALL_PATTERN.match(line)
+    if not match:
+        return None
+    spec = registry.lookup(match.group(1))
+    if spec is None:
+        return None
+
+    call_syntax = match.group(2) is not None
+    arg_text = match.group(2) if call_syntax else (match.group(3) or "")
+    param_types = dict(spec.parameters)
+    positional_names = [name for name, _ in spec.parameters]
+
+    args = {}
+    positional = []
+    pieces = []
+
+    def flush():
+        if pieces:
+            # Unquoted words separated by whitespace form one value, so paths may contain spaces
+            positional.append(" ".join(pieces))
+            del pieces[:]
+
+    for key, value, comma in ARG_TOKEN_PATTERN.findall(arg_text):
+        if comma:
+            if call_syntax:
+                flush()
+            continue
+        if key and key in param_types:
+            flush()
+            args[key] = _coerce(_unquote(value), param_types[key])
+        elif key == SERVER_ARGUMENT:
+            flush()
+            args[key] = _unquote(value)
+        elif value[0] in "\"'":
+            flush()
+            positional.append(_unquote(value))
+        else:
+            pieces.append(value)
+    flush()
+
+    remaining = [name for name in positional_names if name not in args]
+    for name, value in zip(remaining, positional):
+        value = _unquote(value)
+        if value:
+            args[name] = _coerce(value, param_types[name])
+    return ToolCall(spec.name, args, line.strip())
+
+
+class ToolCallParser:
+    """Single-pass, incremental parser for tool invocations in fenced code blocks.
+
+    Text can be fed in arbitrary chunks (e.g. straight from `LLMClient.stream`);
+    each complete line is tokenised once. Calls become available when their
+    block's closing fence arrives, so a streaming caller can act on the first
+    finished block while the model is still generating.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or DEFAULT_REGISTRY
+        self.calls = []
+        self._pending = ""
+        self._in_block = False
+        self._block_calls = []
+
+    def feed(self, chunk):
+        """Consume a chunk of text; return the calls of any blocks it closed"""
+        self._pending += chunk
+        newline = self._pending.rfind("\n")
+        if newline < 0:
+            return []
+        # Only complete lines are scanned; the partial last line waits for more text
+        text, self._pending = self._pending[:newline], self._pending[newline + 1:]
+        return self._scan(text)
+
+    def parse(self, text):
+        """Parse a complete text in one pass and return all calls.
+
+        Same result as `feed(text)` followed by `close()`, without buffering
+        the text line by line.
+        """
+        if self._pending:
+            text, self._pending = self._pending + text, ""
+        self._scan(text)
+        if self._in_block:
+            self._end_block()
+        return self.calls
+
+    def close(self):
+        """Flush buffered text (an unterminated block counts as closed) and return all calls"""
+        if self._pending:
+            self._scan(self._pending)
+            self._pending = ""
+        if self._in_block:
+            self._end_block()
+        return self.calls
+
+    def _scan(self, text):
+        """Scan complete lines, jumping from fence to fence; only block bodies are tokenised"""
+        completed = []
+        pos = 0
+        while True:
+            fence = text.find(FENCE, pos)
+            if self._in_block:
+                body = text[pos:] if fence < 0 else text[pos:fence]
+                self._parse_body(body)
+                if fence < 0:
+                    return completed
+                completed.extend(self._end_block())
+                pos = fence + len(FENCE)
+                continue
+
+            if fence < 0:
+                return completed
+            # Opening fence; the info string (e.g. tool_code) is not needed to recognise calls
+            self._in_block = True
+            start = fence + len(FENCE)
+            line_end = text.find("\n", start)
+            if line_end < 0:
+                line_end = len(text)
+            close = text.find(FENCE, start, line_end)
+            if close < 0:
+                pos = line_end + 1
+                continue
+            # Single-line block: drop a leading info string before looking for the call
+            body = text[start:close]
+            words = body.split(None, 1)
+            if words and words[0] not in self.registry:
+                body = words[1] if len(words) > 1 else ""
+            self._parse_body(body)
+            completed.extend(self._end_block())
+            pos = close + len(FENCE)
+
+    def _parse_body(self, body):
+        registry = self.registry
+        for line in body.split("\n") if "\n" in body else (body,):
+            if line and not line.isspace():
+                call = parse_call(line, registry)
+                if call:
+                    self._block_calls.append(call)
+
+    def _end_block(self):
+        block_calls, self._block_calls = self._block_calls, []
+        self._in_block = False
+        self.calls.extend(block_calls)
+        return block_calls
+
+
+def parse_natural_language(text, registry=None):
+    """Fallback for responses without a tool block, e.g. "I'll list ~/Documents" """
+    registry = registry or DEFAULT_REGISTRY
+    match = NATURAL_PATTERN.search(text)
+    if match:
+        spec = registry.lookup(NATURAL_ACTIONS[match.group(1).split()[0].lower()])
+        path = match.group(2).rstrip(TRAILING_PUNCTUATION)
+        if spec and len(path) > 1:
+            return [ToolCall(spec.name, {"path": path}, match.group(0))]
+    return []
+
+
+def parse_tool_calls(text, registry=None):
+    """Parse every tool call in `text`, falling back to natural language phrasing"""
+    registry = registry or DEFAULT_REGISTRY
+    if FENCE not in text:
+        return parse_natural_language(text, registry)
+    return ToolCallParser(registry).parse(text) or parse_natural_language(text, registry)
@@ -0,0 +1,81 @@
+# Assumed for servers whose /discover payload does not list any tools
+DEFAULT_TOOLS = [
+    {"name": "list_files", "endpoint": "/list", "method": "GET", "parameters": {"path": {"type": "string"}}},
+    {"name": "read_file", "endpoint": "/read", "method": "GET", "parameters": {"path": {"type": "string"}}},
+]
+# Optional call argument naming the server to use ("host:port" or just the host), e.g.
+# `list_files /data server=10.0.0.5:8000`; it is consumed by the router, not sent to the server
+SERVER_ARGUMENT = "server"
+
+
+class ToolRouter:
+    """Route tool invocations to the MCP servers that advertise them in /discover.
+
+    Tools are matched by their advertised name (e.g. `list_files`) or by their
+    endpoint name (e.g. `list`). When several servers offer the same tool, a
+    call picks one with a `server=` argument; without it the first discovered
+    server wins, mirroring discovery order. Servers that advertise a
+    `batch_endpoint` can take several calls in one request.
+    """
+
+    def __init__(self, discovered_servers):
+        self._routes = {}           # tool or action name -> route on the first server offering it
+        self._server_routes = {}    # server address -> {tool or action name -> route}
+        self._batch_actions = {}
+        for server in discovered_servers:
+            service_info = server.get("service_info", {})
+            if service_info.get("batch_endpoint"):
+                self._batch_actions[server["address"]] = service_info["batch_endpoint"].strip("/")
+            server_routes = self._server_routes.setdefault(server["address"], {})
+            tools = service_info.get("available_tools") or DEFAULT_TOOLS
+            for tool in tools:
+                endpoint = tool.get("endpoint", "")
+                route = {
+                    "server": server["address"],
+                    "tool": tool.get("name", endpoint.strip("/")),
+                    "action": endpoint.strip("/"),
+                    "method": tool.get("method", "GET").upper(),
+                    "parameters": tool.get("parameters", {}),
+                }
+                if not route["action"]:
+                    continue
+                for key in (route["tool"], route["action"]):
+                    server_routes.setdefault(key.lower(), route)
+                    self._routes.setdefault(key.lower(), route)
+
+    def __contains__(self, tool_name):
+        return tool_name.lower() in self._routes
+
+    def __bool__(self):
+        return bool(self._routes)
+
+    def route(self, tool_name, server=None):
+        """Return the route for `tool_name`, or None if no server advertises it.
+
+        `server` ("host:port" or a host) restricts the lookup to that server;
+        a host shared by several servers means the first of them offering the tool.
+        """
+        if server is None:
+            return self._routes.get(tool_name.lower())
+        server = str(server).lower()
+        for address, routes in self._server_routes.items():
+            route = routes.get(tool_name.lower())
+            if route and server in (address.lower(), address.rsplit(":", 1)[0].lower()):
+                return route
+        return None
+
+    def route_call(self, call):
+        """Return `(route, params)` for a parsed ToolCall, honouring and stripping its `server=` argument"""
+        params = dict(call.args)
+        server = params.pop(SERVER_ARGUMENT, None)
+        return self.route(call.tool, server), params
+
+    def batch_action(self, server):
+        """Return the batch endpoint name of `server`, or None if it only takes single calls"""
+        return self._batch_actions.get(server)
+
+    def servers(self):
+        return list(self._server_routes)
+
+    def tool_names(self):
+        return sorted({route["tool"] for route in self._routes.values()})
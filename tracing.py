@@ -0,0 +1,287 @@
+import bisect
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_SPANS = 100000
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "thread_id", "start", "duration", "attributes")
+
+    def __init__(self, name, span_id, parent_id, start, attributes):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.thread_id = threading.get_ident()
+        self.start = start
+        self.duration = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Tracer:
+    """In-process span recorder for the agent loop.
+
+    `with tracer.span("llm", model=...) as span:` times a block; spans opened
+    inside it on the same thread become its children. The most recent
+    `max_spans` finished spans are kept in memory (older ones are dropped and
+    counted, so a long-running process stays bounded) and written by
+    `export()` as a Chrome trace-event file, loadable in chrome://tracing or
+    Perfetto, together with a per-name latency summary.
+
+    `with tracer.capture(other):` additionally records the spans finished on
+    the current thread into `other`, e.g. a Tracer per conversation; wrap
+    work handed to an executor with `bind` to keep capturing there.
+    """
+
+    def __init__(self, max_spans=DEFAULT_MAX_SPANS):
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = collections.deque(maxlen=max_spans)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attributes):
+        stack = self._stack()
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+        span = Span(name, span_id, stack[-1].span_id if stack else None, time.perf_counter(), attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            stack.pop()
+            span.duration = time.perf_counter() - span.start
+            self._finish(span)
+
+    def _captures(self):
+        return getattr(self._local, "captures", ())
+
+    @contextmanager
+    def capture(self, into):
+        """Also record the spans finished on this thread into the Tracer `into`"""
+        previous = self._captures()
+        self._local.captures = previous + (into,)
+        try:
+            yield into
+        finally:
+            self._local.captures = previous
+
+    def bind(self, fn):
+        """Wrap `fn` so it runs with this thread's captures, e.g. on an executor thread"""
+        captures = self._captures()
+        if not captures:
+            return fn
+
+        def run(*args, **kwargs):
+            previous = self._captures()
+            self._local.captures = captures
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.captures = previous
+        return run
+
+    def _finish(self, span):
+        self._record(span)
+        for capture in self._captures():
+            capture._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            if len(self.spans) == self.max_spans:
+                self.dropped += 1   # the deque evicts the oldest span
+            self.spans.append(span)
+
+    def summary(self):
+        """Latency statistics (milliseconds) per span name"""
+        with self._lock:
+            spans = list(self.spans)
+        by_name = {}
+        for span in spans:
+            by_name.setdefault(span.name, []).append(span.duration * 1000)
+        summary = {}
+        for name, durations in sorted(by_name.items()):
+            durations.sort()
+            summary[name] = {
+                "count": len(durations),
+                "total_ms": round(sum(durations), 3),
+                "mean_ms": round(sum(durations) / len(durations), 3),
+                "p50_ms": round(_percentile(durations, 0.50), 3),
+                "p95_ms": round(_percentile(durations, 0.95), 3),
+                "max_ms": round(durations[-1], 3),
+            }
+        return summary
+
+    def export(self, path):
+        """Write all finished spans as a Chrome trace-event JSON file"""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id, **span.attributes},
+            }
+            for span in spans
+        ]
+        trace = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"started_at": self.started_at, "dropped_spans": self.dropped},
+            "summary": self.summary(),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(trace, f, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; cheap enough to update on every request"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the maximum for the open bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p90_ms": round(self.quantile(0.90), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {
+                **{f"le_{bound}ms": count for bound, count in zip(self.buckets_ms, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class EndpointMetrics:
+    """Latency histograms keyed by endpoint (e.g. "GET /read") and response status counts"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._histograms = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, seconds, status=200):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.observe(seconds)
+            statuses = self._statuses.setdefault(endpoint, {})
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.monotonic() - self.started, 3),
+                "endpoints": {
+                    endpoint: {**histogram.snapshot(), "status": dict(self._statuses[endpoint])}
+                    for endpoint, histogram in sorted(self._histograms.items())
+                },
+            }
+
+
+class LatencyMiddleware:
+    """ASGI middleware feeding EndpointMetrics.
+
+    Each HTTP request is timed from the moment it reaches the middleware
+    until the last body message (`more_body` false) is sent, so streamed
+    responses count in full. It is labelled by route template (e.g.
+    "GET /read"), read from the scope once the app has routed the request,
+    so query strings do not multiply the histograms.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # GET handlers never call `receive`, so the clock starts as the request comes in
+        started = time.perf_counter()
+        status = 500   # if the app fails before starting a response
+        finished = None
+
+        async def timed_send(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            # The router stores the matched route in the scope, so it is only there once the app returns
+            route = scope.get("route")
+            endpoint = f"{scope['method']} {route.path if route else 'unmatched'}"
+            finished = finished or time.perf_counter()
+            self.metrics.observe(endpoint, finished - started, status)
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+tracer = Tracer()